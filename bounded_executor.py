@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class ExecutorSaturated(Exception):
+    """Raised instead of queueing when every worker is busy and the queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy, retry later")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool for CPU-bound request work (query evaluation, pack generation),
+    so it runs off the event loop. At most max_workers jobs run and max_queued
+    wait; anything beyond that is rejected right away with ExecutorSaturated.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queued: int = 32, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        self.slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self.rejected = 0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise ExecutorSaturated(self.retry_after)
+        try:
+            future = self.pool.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return await asyncio.wrap_future(future)
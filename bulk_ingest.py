@@ -0,0 +1,364 @@
+import gc
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple
+
+from tqdm import tqdm
+
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1 << 20
+# bytes of the bulk file handed to a worker process at a time
+PARALLEL_CHUNK_BYTES = 8 << 20
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# a number is only complete once a character that can not continue it follows
+_NUMBER_END = re.compile(r"[^0-9.eE+-]")
+_FILE_NAME_DROP = re.compile(r"[^A-Za-z0-9_-]+")
+_FILE_NAME_DASHES = re.compile(r"-{2,}")
+
+
+def card_name_to_file_name(card_name):
+    card_name = _FILE_NAME_DROP.sub("", card_name.replace(" ", "-"))
+    return _FILE_NAME_DASHES.sub("-", card_name).strip("-").lower()
+
+
+def parse_price(price) -> float | None:
+    # Scryfall sends prices as strings ("0.25") or null
+    if price is None:
+        return None
+    return float(price)
+
+
+def iter_json_array(f: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yields the elements of the top-level JSON array in f one at a time, reading
+    chunk_size characters at a time, so only about one chunk is held in memory.
+    Raises ValueError if f does not hold exactly one well-formed array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        chunk = f.read(chunk_size)
+        buffer = chunk.lstrip()
+        if not chunk:
+            break
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array")
+    pos = 1
+    eof = False
+    first = True  # right after "[", where "]" may close an empty array
+    after_value = False  # a "," or the closing "]" must come next
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if after_value:
+                if char == "]":
+                    break
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' after an array element, got {char!r}")
+                pos += 1
+                first = after_value = False
+                continue
+            if char == "]" and first:
+                break
+            if char in ",]":
+                raise ValueError(f"Expected an array element, got {char!r}")
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = -1  # incomplete, read on
+            # a number at the end of the buffer may continue in the next chunk
+            if end >= 0 and (eof or type(value) not in (int, float) or _NUMBER_END.match(buffer, end)):
+                yield value
+                pos = end
+                after_value = True
+                continue
+        if eof:
+            raise ValueError("Unterminated or invalid JSON array")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+    rest = buffer[pos + 1:]
+    while True:
+        if rest.strip():
+            raise ValueError("Data after the end of the JSON array")
+        rest = f.read(chunk_size)
+        if not rest:
+            return
+
+
+def card_face(card: dict) -> dict:
+    """The first face of a multi-faced card (where most fields live), or {}."""
+    faces = card.get("card_faces")
+    return faces[0] if faces else {}
+
+
+def normalize_card(card: dict) -> dict:
+    """A Scryfall card object reduced to the fields cards.json holds."""
+    face = card_face(card)
+    get = card.get
+    name = card["name"]
+    type_line = get("type_line", face.get("type_line", ""))
+    prices = get("prices", {})
+    return {
+        "name": name,
+        "safe_name": card_name_to_file_name(name),
+        "file_name": card_name_to_file_name(name + "-" + type_line) + ".webp",
+        "released-at": card["released_at"],
+        "year": int(card["released_at"].split("-")[0]),
+        "mana_cost": get("mana_cost", face.get("mana_cost", "")),
+        "cmc": get("cmc", face.get("cmc", 0)),
+        "type_line": type_line,
+        "oracle_text": get("oracle_text", face.get("oracle_text", "")),
+        "power": get("power", face.get("power", "")),
+        "toughness": get("toughness", face.get("toughness", "")),
+        "loyalty": get("loyalty", face.get("loyalty", "")),
+        "colors": get("colors", face.get("colors", [])),
+        "color_identity": get("color_identity", []),
+        "keywords": get("keywords", []),
+        "set": [get("set", "")],
+        "rarity": get("rarity", ""),
+        "edhrec_rank": get("edhrec_rank", 0),
+        "price_euro": parse_price(prices.get("eur")),
+        "price_usd": parse_price(prices.get("usd")),
+        "legal_formats": [fmt_str for fmt_str, legal in get("legalities", {}).items() if legal == "legal"],
+    }
+
+
+def image_url(card: dict) -> str | None:
+    """The image url of an English, non-promo printing, else None."""
+    if card.get("lang", "en") != "en" or card.get("promo", False):
+        return None
+    return card.get("image_uris", card_face(card).get("image_uris", {})).get("normal")
+
+
+def image_job(card: dict) -> Tuple[str, str] | None:
+    """(image url, file name) for an English, non-promo printing with an image, else None."""
+    url = image_url(card)
+    if not url:
+        return None
+    face = card_face(card)
+    return url, card_name_to_file_name(card["name"] + "-" + card.get("type_line", face.get("type_line", ""))) + ".webp"
+
+
+class CardMerge:
+    """
+    Normalized cards merged by safe_name in first-seen order (the first printing's fields,
+    every printing's set codes) and image jobs as file name -> url, first printing wins.
+    Set codes are unioned as sets while merging and turned into lists once, by result().
+    """
+
+    def __init__(self):
+        self.cards: Dict[str, dict] = {}
+        self.image_jobs: Dict[str, str] = {}
+        self.read = 0  # card objects merged in
+
+    def add(self, card: dict) -> None:
+        self.read += 1
+        normalized = normalize_card(card)
+        merged = self.cards.get(normalized["safe_name"])
+        if merged is None:
+            normalized["set"] = set(normalized["set"])
+            self.cards[normalized["safe_name"]] = normalized
+        else:
+            merged["set"].update(normalized["set"])
+        url = image_url(card)
+        if url:
+            self.image_jobs.setdefault(normalized["file_name"], url)
+
+    def update(self, other: "CardMerge") -> None:
+        """Merges in the cards of a later part of the file."""
+        self.read += other.read
+        cards = self.cards
+        for safe_name, card in other.cards.items():
+            merged = cards.setdefault(safe_name, card)
+            if merged is not card:
+                merged["set"] |= card["set"]
+        image_jobs = self.image_jobs
+        for file_name, url in other.image_jobs.items():
+            image_jobs.setdefault(file_name, url)
+
+    def result(self) -> Tuple[List[dict], Dict[str, str]]:
+        for card in self.cards.values():
+            card["set"] = sorted(card["set"])
+        return list(self.cards.values()), self.image_jobs
+
+
+@contextmanager
+def gc_paused():
+    """
+    Ingest builds hundreds of thousands of long-lived dicts and lists, and each batch
+    of them makes the cyclic GC rescan everything built so far; none of them form cycles.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def iter_bulk_cards(bulk_file_name: str) -> Iterator[dict]:
+    with open(bulk_file_name, "r", encoding="utf-8") as f:
+        yield from tqdm(iter_json_array(f), desc="Reading bulk data", unit=" cards")
+
+
+def element_delimiter(bulk_file_name: str) -> bytes | None:
+    """
+    The bytes that open each top-level element on a new line: a newline, the first
+    element's indentation and "{". Scryfall writes one card per line and json.dump(indent=...)
+    indents elements evenly, so nested objects never match. None if the first element
+    does not start a line (e.g. everything on one line).
+    """
+    with open(bulk_file_name, "rb") as f:
+        head = f.read(READ_CHUNK_SIZE)
+    if not head.lstrip().startswith(b"["):
+        return None
+    start = head.find(b"{")
+    if start < 0:
+        return None
+    line_start = head.rfind(b"\n", 0, start)
+    if line_start < 0 or head[line_start:start].strip():
+        return None
+    return head[line_start:start + 1]
+
+
+def iter_bulk_chunks(bulk_file_name: str, delimiter: bytes, chunk_bytes: int = PARALLEL_CHUNK_BYTES) -> Iterator[bytes]:
+    """Pieces of about chunk_bytes, each cut right before a delimiter, so they hold whole elements."""
+    rest = b""
+    with open(bulk_file_name, "rb") as f:
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            buffer = rest + data
+            cut = buffer.rfind(delimiter)
+            if cut <= 0:
+                rest = buffer
+                continue
+            yield buffer[:cut]
+            rest = buffer[cut:]
+    if rest:
+        yield rest
+
+
+def iter_json_elements(text: str) -> Iterator[Any]:
+    """
+    The values in a piece of a JSON array cut by iter_bulk_chunks: whole elements, each
+    followed by a comma, with the opening bracket if it is the first piece and the closing
+    one instead of the last comma if it is the last. Raises ValueError on anything else,
+    e.g. a missing or doubled comma, or a piece that does not end on an element boundary.
+    """
+    decoder = json.JSONDecoder()
+    pos = _WHITESPACE.match(text).end()
+    first = text.startswith("[", pos)
+    if first:
+        pos = _WHITESPACE.match(text, pos + 1).end()
+    while pos < len(text):
+        if text[pos] == "]" and first:
+            break
+        if text[pos] in ",]":
+            raise ValueError(f"Expected an array element, got {text[pos]!r}")
+        value, pos = decoder.raw_decode(text, pos)
+        yield value
+        first = False
+        pos = _WHITESPACE.match(text, pos).end()
+        if text.startswith("]", pos):
+            break
+        if not text.startswith(",", pos):
+            raise ValueError("Expected ',' or ']' after an array element"
+                             + (f", got {text[pos]!r}" if pos < len(text) else ""))
+        pos = _WHITESPACE.match(text, pos + 1).end()
+    if text[pos + 1:].strip():
+        raise ValueError("Data after the end of the JSON array")
+
+
+def ingest_chunk(chunk: bytes) -> CardMerge:
+    """Worker process side of ingest_bulk_file: parses, normalizes and merges one piece."""
+    merge = CardMerge()
+    with gc_paused():
+        for card in iter_json_elements(chunk.decode("utf-8")):
+            merge.add(card)
+    return merge
+
+
+def _ingest_parallel(bulk_file_name: str, delimiter: bytes, workers: int) -> CardMerge:
+    merge = CardMerge()
+    # a few pieces per worker in flight keep every core busy without reading ahead the whole file
+    pending: deque = deque()
+    progress = tqdm(total=os.path.getsize(bulk_file_name), desc="Reading bulk data", unit="B", unit_scale=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool, progress:
+        def collect():
+            future, size = pending.popleft()
+            merge.update(future.result())
+            progress.update(size)
+
+        last = b""
+        for last in iter_bulk_chunks(bulk_file_name, delimiter, PARALLEL_CHUNK_BYTES):
+            pending.append((pool.submit(ingest_chunk, last), len(last)))
+            if len(pending) >= 2 * workers:
+                collect()
+        # every piece but the last ends on a comma, so only the last one shows a missing "]"
+        if not last.rstrip().endswith(b"]"):
+            raise ValueError("Unterminated JSON array")
+        while pending:
+            collect()
+    return merge
+
+
+def ingest_bulk_file(bulk_file_name: str, workers: int | None = None) -> Tuple[List[dict], Dict[str, str]]:
+    """
+    Returns the normalized cards of a Scryfall bulk file merged by safe_name (their set
+    codes combined), and the image jobs as file name -> url (the first printing seen for
+    a file). With more than one worker (default: one per core) the file is cut into pieces
+    of whole cards that worker processes parse, normalize and merge, and the pieces are
+    merged back in file order, so the result is the same as reading it in one pass.
+    Otherwise, or if the file can not be cut (see element_delimiter), it is read as a
+    stream in this process; either way memory follows the number of distinct cards.
+    """
+    with gc_paused():
+        return _ingest(bulk_file_name, workers).result()
+
+
+def _ingest(bulk_file_name: str, workers: int | None) -> CardMerge:
+    workers = workers or os.cpu_count() or 1
+    delimiter = element_delimiter(bulk_file_name) if workers > 1 else None
+    if delimiter is not None:
+        try:
+            return _ingest_parallel(bulk_file_name, delimiter, workers)
+        except ValueError:
+            logger.warning("Could not cut %s into whole cards, reading it in one pass", bulk_file_name)
+    merge = CardMerge()
+    for card in iter_bulk_cards(bulk_file_name):
+        merge.add(card)
+    return merge
+
+
+def benchmark(bulk_file_name: str, workers_options: Iterable[int]) -> None:
+    """Times ingest with each worker count and reports bulk file cards per second."""
+    for workers in workers_options:
+        started = time.perf_counter()
+        with gc_paused():
+            merge = _ingest(bulk_file_name, workers)
+        elapsed = time.perf_counter() - started
+        print(f"{workers:>3} workers: {merge.read} cards ({len(merge.cards)} unique) in {elapsed:.2f}s, "
+              f"{merge.read / elapsed:,.0f} cards/sec")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python bulk_ingest.py <bulk_file_name> <optional: worker counts, e.g. 1,2,4>")
+        sys.exit(1)
+    counts = sys.argv[2] if len(sys.argv) > 2 else f"1,{os.cpu_count() or 1}"
+    benchmark(sys.argv[1], [int(count) for count in counts.split(",")])
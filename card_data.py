@@ -0,0 +1,33 @@
+from card_index import NameIndex
+from card_json import CardJsonCache
+from card_store import CardStore
+from scryfall_bulk_importer import load_store
+from set_pools import SetPools
+
+
+class CardDataUnavailable(Exception):
+    """Raised when a draft's card data version is no longer loaded; its card ids cannot be resolved."""
+
+    def __init__(self, version: str):
+        super().__init__("Draft card data is no longer available")
+        self.version = version
+
+
+class CardData:
+    """
+    One version of the card data and everything derived from it. The server swaps the
+    current one as a whole when the data is reloaded; a request reads it once and uses
+    only that, so it finishes on the version it started with.
+    """
+
+    def __init__(self, store: CardStore):
+        self.store = store
+        self.version = store.version
+        # snapshots written before these were saved with it do not have them
+        self.set_pools = store.derived.get("set_pools") or SetPools.from_store(store)
+        self.name_index = store.derived.get("names") or NameIndex.from_store(store)
+        self.card_json = CardJsonCache(store)
+
+    @classmethod
+    def load(cls, file_path: str) -> "CardData":
+        return cls(load_store(file_path))
@@ -0,0 +1,200 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import chain
+
+from card_store import MISSING, CardStore, DictColumn, NumberColumn, mask_from_rows
+
+
+TEXT_INDEX_KEYS = ("oracle_text", "name", "type_line", "keywords")
+NUMERIC_INDEX_KEYS = ("cmc", "price_usd", "price_euro", "year", "edhrec_rank")
+NGRAM_SIZE = 3
+# intersecting the rarest few n-grams already leaves a handful of candidates
+MAX_NGRAMS_PER_QUERY = 8
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class NgramIndex:
+    """
+    Inverted index from lowercased character n-grams to the distinct values
+    (table codes) of a dictionary encoded column that contain them.
+    Only narrows candidates; matches are still confirmed with the real predicate.
+    """
+
+    def __init__(self, postings: dict[str, array]):
+        self.postings = postings
+
+    @classmethod
+    def from_column(cls, column: DictColumn) -> "NgramIndex":
+        postings: dict[str, list[int]] = defaultdict(list)
+        for code, value in enumerate(column.table):
+            if value is MISSING:
+                continue
+            if isinstance(value, str):
+                texts = [value]
+            elif isinstance(value, list):
+                texts = [str(v) for v in value]
+            else:
+                continue
+            grams: set[str] = set()
+            for text in texts:
+                grams |= _ngrams(text.lower())
+            for gram in grams:
+                postings[gram].append(code)
+        typecode = column.codes.typecode
+        return cls({gram: array(typecode, codes) for gram, codes in postings.items()})
+
+    def candidates(self, value: str) -> list[int] | None:
+        """Table codes whose value may contain `value`, or None if it is too short to narrow down."""
+        grams = _ngrams(value.lower())
+        if not grams:
+            return None
+        grams = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+        found = set(self.postings.get(grams[0], ()))
+        for gram in grams[1:MAX_NGRAMS_PER_QUERY]:
+            if not found:
+                break
+            found.intersection_update(self.postings.get(gram, ()))
+        return sorted(found)
+
+
+class SortedIndex:
+    """Row ids of a numeric column ordered by value, so range predicates become two binary searches."""
+
+    def __init__(self, values: array, order: array, size: int, present: int | None = None):
+        self.values = values
+        self.order = order
+        self.size = size
+        self.present = mask_from_rows(order, size) if present is None else present
+
+    @classmethod
+    def from_column(cls, column: NumberColumn) -> "SortedIndex":
+        column_values = column.values
+        rows = [row for row, value in enumerate(column_values) if value == value]  # NaN (None) never matches
+        rows.sort(key=column_values.__getitem__)
+        values = array(column_values.typecode, map(column_values.__getitem__, rows))
+        return cls(values, array("I", rows), len(column))
+
+    def range(self, symbol: str, value: float) -> tuple[int, int]:
+        """Slice of self.order whose rows satisfy `row_value <symbol> value`."""
+        match symbol:
+            case "=":
+                return bisect_left(self.values, value), bisect_right(self.values, value)
+            case ">":
+                return bisect_right(self.values, value), len(self.values)
+            case ">=":
+                return bisect_left(self.values, value), len(self.values)
+            case "<":
+                return 0, bisect_left(self.values, value)
+            case "<=":
+                return 0, bisect_right(self.values, value)
+            case _:
+                raise ValueError(f"Unsupported operator for numeric comparison: {symbol}")
+
+    def select(self, symbol: str, value: float) -> int:
+        lo, hi = self.range(symbol, value)
+        if hi - lo <= len(self.order) // 2:
+            return mask_from_rows(self.order[lo:hi], self.size)
+        # wide ranges are cheaper to build from the rows outside of them
+        return self.present ^ mask_from_rows(chain(self.order[:lo], self.order[hi:]), self.size)
+
+
+def build_text_indexes(store: CardStore) -> None:
+    for key in TEXT_INDEX_KEYS:
+        column = store.column(key)
+        if isinstance(column, DictColumn):
+            store.indexes[key] = NgramIndex.from_column(column)
+
+def build_numeric_indexes(store: CardStore) -> None:
+    for key in NUMERIC_INDEX_KEYS:
+        column = store.column(key)
+        if isinstance(column, NumberColumn):
+            store.indexes[key] = SortedIndex.from_column(column)
+
+def build_index(store: CardStore, key: str) -> None:
+    """Rebuilds the index of one column after it was replaced; drops it if the column no longer qualifies."""
+    store.indexes.pop(key, None)
+    column = store.column(key)
+    if key in TEXT_INDEX_KEYS and isinstance(column, DictColumn):
+        store.indexes[key] = NgramIndex.from_column(column)
+    elif key in NUMERIC_INDEX_KEYS and isinstance(column, NumberColumn):
+        store.indexes[key] = SortedIndex.from_column(column)
+
+
+class PrefixIndex:
+    """Sorted (key, row) pairs, so the rows whose key starts with a prefix are one bisect range."""
+
+    def __init__(self, keys: list[str], rows: array):
+        self.keys = keys
+        self.rows = rows
+
+    @classmethod
+    def from_pairs(cls, pairs: list[tuple[str, int]]) -> "PrefixIndex":
+        pairs.sort()
+        return cls([key for key, _ in pairs], array("I", [row for _, row in pairs]))
+
+    def prefix(self, prefix: str, limit: int) -> array:
+        start = bisect_left(self.keys, prefix)
+        end = start
+        while end < len(self.keys) and end - start < limit and self.keys[end].startswith(prefix):
+            end += 1
+        return self.rows[start:end]
+
+
+class NameIndex:
+    """
+    Card lookup by name: an exact safe_name -> row hash index, and prefix indexes over
+    lowercased names for typeahead, matching the start of the name or of any later word.
+    Tied to the store's data version, like SetPools; built with the store and saved with its snapshot.
+    """
+    SOURCE_KEYS = ("safe_name", "name")  # the columns it is built from
+
+    def __init__(self, version: str, by_safe_name: dict[str, int], names: PrefixIndex, words: PrefixIndex):
+        self.version = version
+        self.by_safe_name = by_safe_name
+        self.names = names
+        self.words = words
+
+    @classmethod
+    def from_store(cls, store: CardStore) -> "NameIndex":
+        by_safe_name: dict[str, int] = {}
+        safe_names = store.column("safe_name")
+        if isinstance(safe_names, DictColumn):
+            table = safe_names.table
+            for row, code in enumerate(safe_names.codes):
+                by_safe_name.setdefault(table[code], row)
+
+        names, words = [], []
+        name_column = store.column("name")
+        if isinstance(name_column, DictColumn):
+            table = name_column.table
+            for row, code in enumerate(name_column.codes):
+                name = table[code]
+                if not isinstance(name, str):
+                    continue
+                name = name.lower()
+                names.append((name, row))
+                for i in range(1, len(name)):
+                    if name[i - 1] == " ":
+                        words.append((name[i:], row))
+        return cls(store.version, by_safe_name, PrefixIndex.from_pairs(names), PrefixIndex.from_pairs(words))
+
+    def row(self, safe_name: str) -> int | None:
+        return self.by_safe_name.get(safe_name)
+
+    def complete(self, prefix: str, limit: int = 10) -> list[int]:
+        """Rows whose name starts with prefix (alphabetically), then those with a later word starting with it."""
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        found = dict.fromkeys(self.names.prefix(prefix, limit))
+        if len(found) < limit:
+            # a name can match at several words, so look further to fill the limit with distinct rows
+            for row in self.words.prefix(prefix, limit * 4):
+                found.setdefault(row)
+                if len(found) >= limit:
+                    break
+        return list(found)[:limit]
@@ -0,0 +1,41 @@
+import json
+from typing import Any, Iterable
+
+from card_store import CardStore
+
+
+def encode_json(value: Any) -> bytes:
+    # same encoding as Starlette's JSONResponse
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def splice_json(envelope: dict, key: str, raw: bytes) -> bytes:
+    """Encodes envelope with an extra `key` member whose value is the already encoded `raw`."""
+    head = encode_json(envelope)[:-1]
+    if envelope:
+        head += b","
+    return head + encode_json(key) + b":" + raw + b"}"
+
+
+class CardJsonCache:
+    """
+    Each full card's JSON encoding, made on first use and kept for the store's data
+    version, so responses are built by joining bytes instead of re-encoding cards.
+    """
+
+    def __init__(self, store: CardStore):
+        self.store = store
+        self.version = store.version
+        self.encoded: list[bytes | None] = [None] * len(store)
+
+    def card(self, row: int) -> bytes:
+        raw = self.encoded[row]
+        if raw is None:
+            raw = self.encoded[row] = encode_json(self.store.card(row))
+        return raw
+
+    def cards(self, rows: Iterable[int], keys: list[str] | None = None) -> bytes:
+        """A JSON array of the cards; only full cards (keys None) come from the cache."""
+        if keys is not None:
+            return encode_json(self.store.cards(rows, keys))
+        return b"[" + b",".join(map(self.card, rows)) + b"]"
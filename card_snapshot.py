@@ -0,0 +1,277 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from functools import cached_property
+from typing import Any
+
+from card_index import NameIndex, NgramIndex, PrefixIndex, SortedIndex
+from card_store import MISSING, CardStore, ColorColumn, DictColumn, NumberColumn
+from set_pools import RarityPools, SetPools
+
+
+# Layout of a snapshot file:
+#   MAGIC | format version (u32) | header length (u64) | JSON header | aligned array sections
+# The header describes every column and index and points at its sections; numeric
+# columns, codes and index arrays are used straight from the memory map, so several
+# server processes mapping the same file share the same read-only pages.
+
+MAGIC = b"LSCS"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+_PREFIX = struct.Struct("<4sIQ")
+
+
+class _SectionWriter:
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.offset = 0
+
+    def add(self, data: bytes, typecode: str = "B") -> dict:
+        section = {"offset": self.offset, "length": len(data), "typecode": typecode}
+        padding = -len(data) % ALIGNMENT
+        self.chunks.append(data + b"\0" * padding)
+        self.offset += len(data) + padding
+        return section
+
+    def add_array(self, values) -> dict:
+        return self.add(values.tobytes(), _typecode(values))
+
+
+def _typecode(values) -> str:
+    # columns are arrays when built from JSON and memoryviews when loaded from a snapshot
+    return values.format if isinstance(values, memoryview) else values.typecode
+
+
+def _encode_table(table: list) -> tuple[bytes, int | None]:
+    missing = next((code for code, value in enumerate(table) if value is MISSING), None)
+    values = [None if value is MISSING else value for value in table]
+    return json.dumps(values, ensure_ascii=False).encode("utf-8"), missing
+
+
+def _add_keys(sections: _SectionWriter, keys: list[str], rows) -> dict:
+    # keys go into a section rather than the header, which is read on every version check
+    return {"keys": sections.add(json.dumps(keys, ensure_ascii=False).encode("utf-8")), "rows": sections.add_array(rows)}
+
+
+def _write_derived(store: CardStore, sections: _SectionWriter) -> dict:
+    derived = {}
+    names = store.derived.get("names")
+    if names is not None:
+        derived["names"] = {
+            "by_safe_name": _add_keys(sections, list(names.by_safe_name), array("I", names.by_safe_name.values())),
+            "names": _add_keys(sections, names.names.keys, names.names.rows),
+            "words": _add_keys(sections, names.words.keys, names.words.rows),
+        }
+    set_pools = store.derived.get("set_pools")
+    if set_pools is not None:
+        # each set's base pools one after the other, in RarityPools.BASE_POOLS order
+        offsets = array("Q", [0])
+        rows = array("I")
+        for pools in set_pools.pools.values():
+            for name in RarityPools.BASE_POOLS:
+                rows.extend(getattr(pools, name))
+                offsets.append(len(rows))
+        derived["set_pools"] = {"sets": list(set_pools.pools), "offsets": sections.add_array(offsets), "rows": sections.add_array(rows)}
+    return derived
+
+
+def write_snapshot(store: CardStore, file_path: str) -> None:
+    sections = _SectionWriter()
+    columns = {}
+    for key in store.keys:
+        column = store.columns[key]
+        if isinstance(column, NumberColumn):
+            columns[key] = {"type": "number", "values": sections.add_array(column.values), "nullable": column.nullable}
+            continue
+        table, missing = _encode_table(column.table)
+        columns[key] = {"type": "dict", "codes": sections.add_array(column.codes), "table": sections.add(table), "missing": missing}
+        if isinstance(column, ColorColumn):
+            columns[key]["type"] = "color"
+            columns[key]["bits"] = sections.add_array(column.bits)
+
+    indexes = {}
+    for key, index in store.indexes.items():
+        if isinstance(index, NgramIndex):
+            grams = list(index.postings)
+            offsets = array("Q", [0])
+            postings = array(_typecode(store.columns[key].codes))
+            for gram in grams:
+                postings.extend(index.postings[gram])
+                offsets.append(len(postings))
+            indexes[key] = {"type": "ngram", "grams": grams, "offsets": sections.add_array(offsets), "postings": sections.add_array(postings)}
+        elif isinstance(index, SortedIndex):
+            indexes[key] = {
+                "type": "sorted",
+                "values": sections.add_array(index.values),
+                "order": sections.add_array(index.order),
+                "present": sections.add(index.present.to_bytes(store.size, "little")),
+            }
+
+    header = json.dumps({
+        "size": store.size,
+        "version": store.version,
+        "byteorder": sys.byteorder,
+        "keys": store.keys,
+        "columns": columns,
+        "indexes": indexes,
+        "derived": _write_derived(store, sections),
+        "metadata": store.metadata,
+    }, ensure_ascii=False).encode("utf-8")
+    header += b" " * (-(_PREFIX.size + len(header)) % ALIGNMENT)
+
+    # written next to the target and renamed, so a running server never maps a half-written file
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for chunk in sections.chunks:
+            f.write(chunk)
+    os.replace(tmp_path, file_path)
+
+
+class _LazyTable:
+    """Decodes a column's value table from the snapshot on first use."""
+
+    @cached_property
+    def table(self) -> list:
+        table = json.loads(bytes(self._table_data))
+        if self._missing is not None:
+            table[self._missing] = MISSING
+        return table
+
+
+class SnapshotDictColumn(_LazyTable, DictColumn):
+    def __init__(self, codes: memoryview, table_data: memoryview, missing: int | None):
+        self.codes = codes
+        self._table_data = table_data
+        self._missing = missing
+
+
+class SnapshotColorColumn(_LazyTable, ColorColumn):
+    def __init__(self, codes: memoryview, table_data: memoryview, missing: int | None, bits: memoryview):
+        self.codes = codes
+        self.bits = bits
+        self._table_data = table_data
+        self._missing = missing
+
+
+class _Postings:
+    """Read-only gram -> codes mapping over the concatenated postings section."""
+
+    def __init__(self, grams: list[str], offsets: memoryview, postings: memoryview):
+        self.slots = {gram: i for i, gram in enumerate(grams)}
+        self.offsets = offsets
+        self.data = postings
+
+    def get(self, gram: str, default: Any = None):
+        i = self.slots.get(gram)
+        if i is None:
+            return default
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, gram: str):
+        value = self.get(gram)
+        if value is None:
+            raise KeyError(gram)
+        return value
+
+    def __iter__(self):
+        return iter(self.slots)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+
+def _read_header(file_path: str) -> dict | None:
+    try:
+        with open(file_path, "rb") as f:
+            magic, format_version, header_length = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != MAGIC or format_version != FORMAT_VERSION:
+                return None
+            header = json.loads(f.read(header_length))
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get("byteorder") != sys.byteorder:
+        return None
+    return header
+
+
+def read_snapshot_version(file_path: str) -> str | None:
+    """Data version recorded in a snapshot, or None if the file is not a usable snapshot."""
+    header = _read_header(file_path)
+    return header.get("version") if header else None
+
+
+def read_snapshot_metadata(file_path: str) -> dict[str, Any]:
+    """Metadata recorded in a snapshot, empty if the file is not a usable snapshot."""
+    header = _read_header(file_path)
+    return header.get("metadata", {}) if header else {}
+
+
+def load_snapshot(file_path: str) -> CardStore:
+    with open(file_path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, format_version, header_length = _PREFIX.unpack(view[:_PREFIX.size])
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError(f"{file_path} is not a card snapshot (format {FORMAT_VERSION})")
+    header = json.loads(bytes(view[_PREFIX.size:_PREFIX.size + header_length]))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{file_path} was written on a {header['byteorder']}-endian machine")
+    base = _PREFIX.size + header_length
+
+    def section(info: dict) -> memoryview:
+        start = base + info["offset"]
+        return view[start:start + info["length"]].cast(info["typecode"])
+
+    def keys(info: dict) -> list[str]:
+        return json.loads(bytes(section(info["keys"])))
+
+    columns = {}
+    for key, info in header["columns"].items():
+        match info["type"]:
+            case "number":
+                columns[key] = NumberColumn(section(info["values"]), info["nullable"])
+            case "dict":
+                columns[key] = SnapshotDictColumn(section(info["codes"]), section(info["table"]), info["missing"])
+            case "color":
+                columns[key] = SnapshotColorColumn(section(info["codes"]), section(info["table"]), info["missing"], section(info["bits"]))
+            case other:
+                raise ValueError(f"Unknown column type in snapshot: {other}")
+
+    store = CardStore(header["keys"], columns, header["size"], header["version"])
+    store.metadata = header.get("metadata", {})
+    for key, info in header["indexes"].items():
+        match info["type"]:
+            case "ngram":
+                store.indexes[key] = NgramIndex(_Postings(info["grams"], section(info["offsets"]), section(info["postings"])))
+            case "sorted":
+                present = int.from_bytes(section(info["present"]), "little")
+                store.indexes[key] = SortedIndex(section(info["values"]), section(info["order"]), header["size"], present)
+
+    # absent from snapshots written before they were saved; CardData builds them then
+    derived = header.get("derived", {})
+    if "names" in derived:
+        info = derived["names"]
+        store.derived["names"] = NameIndex(
+            store.version,
+            dict(zip(keys(info["by_safe_name"]), section(info["by_safe_name"]["rows"]))),
+            PrefixIndex(keys(info["names"]), section(info["names"]["rows"])),
+            PrefixIndex(keys(info["words"]), section(info["words"]["rows"])),
+        )
+    if "set_pools" in derived:
+        info = derived["set_pools"]
+        offsets = section(info["offsets"])
+        rows = section(info["rows"]).tolist()
+        pools = {}
+        for i, set_code in enumerate(info["sets"]):
+            set_pools = pools[set_code] = RarityPools()
+            for j, name in enumerate(RarityPools.BASE_POOLS):
+                k = i * len(RarityPools.BASE_POOLS) + j
+                setattr(set_pools, name, rows[offsets[k]:offsets[k + 1]])
+            set_pools.finish()
+        store.derived["set_pools"] = SetPools(store.version, pools)
+    return store
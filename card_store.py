@@ -0,0 +1,238 @@
+from array import array
+from itertools import compress, repeat
+from typing import Any, Callable, Iterable, Iterator
+
+
+# Selections over the store are plain ints holding one byte per row (0 or 1),
+# so AND / OR / NOT of two selections run as a single C-level int operation.
+
+def mask_from_flags(flags: Iterable[int]) -> int:
+    return int.from_bytes(bytes(flags), "little")
+
+def full_mask(size: int) -> int:
+    return int.from_bytes(b"\x01" * size, "little")
+
+def mask_count(mask: int) -> int:
+    return mask.bit_count()
+
+def mask_rows(mask: int, size: int) -> list[int]:
+    return list(compress(range(size), mask.to_bytes(size, "little")))
+
+def mask_from_rows(rows: Iterable[int], size: int) -> int:
+    flags = bytearray(size)
+    for row in rows:
+        flags[row] = 1
+    return int.from_bytes(flags, "little")
+
+
+MISSING = object()
+
+COLOR_BITS = {"W": 1, "U": 2, "B": 4, "R": 8, "G": 16}
+COLOR_FIELDS = ("colors", "color_identity")
+
+
+def _codes_array(size: int) -> array:
+    if size <= 0xFF:
+        return array("B")
+    if size <= 0xFFFF:
+        return array("H")
+    return array("I")
+
+
+class NumberColumn:
+    """Typed array of ints or floats. Nullable float columns store None as NaN."""
+    kind = "number"
+
+    def __init__(self, values: array, nullable: bool = False):
+        self.values = values
+        self.nullable = nullable
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, row: int) -> Any:
+        value = self.values[row]
+        if self.nullable and value != value:
+            return None
+        return value
+
+    def select(self, predicate: Callable[[Any], bool]) -> int:
+        if self.nullable:
+            # predicates see missing values as None, like get() returns them
+            return mask_from_flags(predicate(None if value != value else value) for value in self.values)
+        return mask_from_flags(map(predicate, self.values))
+
+    def compare(self, func: Callable[[Any, Any], bool], value: Any) -> int:
+        """Mask of rows where func(value, row_value) holds. NaN never matches."""
+        return mask_from_flags(map(func, repeat(value), self.values))
+
+
+class DictColumn:
+    """Dictionary encoded column: one small int code per row into a table of distinct values."""
+    kind = "dict"
+
+    def __init__(self, table: list, codes: array):
+        self.table = table
+        self.codes = codes
+
+    @classmethod
+    def from_values(cls, values: list) -> "DictColumn":
+        lookup: dict = {}
+        table: list = []
+        raw_codes = []
+        for value in values:
+            # keyed by type too, so 1, 1.0 and True stay distinct values
+            key = (type(value), tuple(value) if isinstance(value, list) else value)
+            code = lookup.get(key)
+            if code is None:
+                code = lookup[key] = len(table)
+                table.append(value)
+            raw_codes.append(code)
+        codes = _codes_array(len(table))
+        codes.extend(raw_codes)
+        return cls(table, codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def get(self, row: int) -> Any:
+        value = self.table[self.codes[row]]
+        return list(value) if isinstance(value, list) else value
+
+    def select(self, predicate: Callable[[Any], bool]) -> int:
+        """Evaluates predicate once per distinct value and spreads the result over the rows."""
+        hits = bytes(value is not MISSING and bool(predicate(value)) for value in self.table)
+        return mask_from_flags(map(hits.__getitem__, self.codes))
+
+    def select_codes(self, predicate: Callable[[Any], bool], codes: Iterable[int]) -> int:
+        """Like select, but only evaluates predicate for the given table codes (e.g. index candidates)."""
+        hits = bytearray(len(self.table))
+        for code in codes:
+            if predicate(self.table[code]):
+                hits[code] = 1
+        return mask_from_flags(map(hits.__getitem__, self.codes))
+
+    def distinct(self) -> list:
+        return [value for value in self.table if value is not MISSING]
+
+
+class ColorColumn(DictColumn):
+    """Colour lists, with a WUBRG bitmask per row next to the original lists."""
+    kind = "color"
+
+    def __init__(self, table: list, codes: array, bits: array):
+        super().__init__(table, codes)
+        self.bits = bits
+
+    @classmethod
+    def from_values(cls, values: list) -> "ColorColumn":
+        column = DictColumn.from_values(values)
+        table_bits = []
+        for colors in column.table:
+            mask = 0
+            for color in colors:
+                mask |= COLOR_BITS[color]
+            table_bits.append(mask)
+        return cls(column.table, column.codes, array("B", map(table_bits.__getitem__, column.codes)))
+
+    def select(self, predicate: Callable[[Any], bool]) -> int:
+        # Colour predicates only look at set membership and size, so they can be
+        # evaluated once for each of the 32 possible masks.
+        hits = bytes(bool(predicate([c for c, bit in COLOR_BITS.items() if mask & bit])) for mask in range(32))
+        return mask_from_flags(map(hits.__getitem__, self.bits))
+
+
+def _is_color_list(value: Any) -> bool:
+    return isinstance(value, list) and all(c in COLOR_BITS for c in value) and len(set(value)) == len(value)
+
+# the largest ints a float column holds exactly
+FLOAT_INT_LIMIT = 2 ** 53
+
+def _fits_float_column(value: Any) -> bool:
+    return value is None or type(value) is float or (type(value) is int and -FLOAT_INT_LIMIT <= value <= FLOAT_INT_LIMIT)
+
+def build_column(key: str, values: list):
+    if values and all(type(v) is int for v in values):
+        return NumberColumn(array("q", values))
+    # floats mixed with ints or None (e.g. cmc written as 3 and 2.5) share one float column
+    if any(v is not None for v in values) and all(_fits_float_column(v) for v in values):
+        nullable = any(v is None for v in values)
+        return NumberColumn(array("d", [float("nan") if v is None else v for v in values]), nullable)
+    if key in COLOR_FIELDS and all(_is_color_list(v) for v in values):
+        return ColorColumn.from_values(values)
+    return DictColumn.from_values(values)
+
+
+def select_rows(column, predicate: Callable[[Any], bool], rows: list[int]) -> int:
+    """Like column.select, but only evaluates predicate for the given rows."""
+    get = column.get
+    return mask_from_rows((row for row in rows if (value := get(row)) is not MISSING and predicate(value)), len(column))
+
+
+class CardStore:
+    """
+    Columnar replacement for the list of card dicts.
+    Every field lives in its own column; card dicts are only built for the rows
+    that actually leave the store (search results, packs, ...).
+    """
+
+    def __init__(self, keys: list[str], columns: dict[str, Any], size: int, version: str = ""):
+        self.keys = keys
+        self.columns = columns
+        self.size = size
+        self.version = version
+        self.all = full_mask(size)
+        self.indexes: dict[str, Any] = {}
+        # small derived facts (e.g. draftable sets) that are saved with the snapshot
+        self.metadata: dict[str, Any] = {}
+        # lookups over the whole store ("names": NameIndex, "set_pools": SetPools), also saved with the snapshot
+        self.derived: dict[str, Any] = {}
+
+    @classmethod
+    def from_cards(cls, cards: list[dict], version: str = "") -> "CardStore":
+        keys = list(dict.fromkeys(key for card in cards for key in card))
+        columns = {key: build_column(key, [card.get(key, MISSING) for card in cards]) for key in keys}
+        return cls(keys, columns, len(cards), version)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, row: int) -> dict:
+        return self.card(row)
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self.card(row) for row in range(self.size))
+
+    def card(self, row: int, keys: list[str] | None = None) -> dict:
+        """Builds the card dict for a row, optionally with only the given keys."""
+        card = {}
+        for key in self.keys if keys is None else keys:
+            column = self.columns.get(key)
+            if column is None:
+                continue
+            value = column.get(row)
+            if value is not MISSING:
+                card[key] = value
+        return card
+
+    def cards(self, rows: Iterable[int], keys: list[str] | None = None) -> list[dict]:
+        return [self.card(row, keys) for row in rows]
+
+    def column(self, key: str):
+        return self.columns.get(key)
+
+    def get(self, row: int, key: str, default: Any = None) -> Any:
+        column = self.columns.get(key)
+        if column is None:
+            return default
+        value = column.get(row)
+        return default if value is MISSING else value
+
+    def rows(self, mask: int) -> list[int]:
+        return mask_rows(mask, self.size)
+
+    def iter_rows(self, mask: int) -> Iterator[int]:
+        return compress(range(self.size), mask.to_bytes(self.size, "little"))
+
+    def count(self, mask: int) -> int:
+        return mask_count(mask)
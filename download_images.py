@@ -1,99 +1,177 @@
+import asyncio
+import io
 import json
-import requests
-from tqdm import tqdm
-from PIL import Image
-import threading
-import queue
 import os
+import random
 import sys
+import time
+import httpx
+from tqdm import tqdm
+from PIL import Image
+from bulk_ingest import image_job, iter_bulk_cards
+
+IMAGES_DIR = "./images"
+# file name -> url of every image downloaded, so updates only fetch new and changed images
+IMAGE_SOURCES_PATH = "./images/sources.json"
+
+MAX_CONCURRENT_DOWNLOADS = 16
+REQUESTS_PER_SECOND = 20
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.5  # doubled after each failed attempt
+MAX_RETRY_DELAY_SECONDS = 60
+# sources.json is saved this often during a run, so an interrupted sync resumes where it stopped
+SAVE_PROGRESS_SECONDS = 10
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+HEADERS = {"User-Agent": "local-scryfall/1.0", "Accept": "image/*"}
+
+
+class TokenBucket:
+    """Lets `rate` requests a second through on average, in bursts of at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def convert_image(content, filename):
+    # written under a temporary name, so an interrupted run never leaves half an image behind
+    tmp_path = filename + ".tmp"
+    with Image.open(io.BytesIO(content)) as img:
+        img.save(tmp_path, "WEBP", quality=80)
+    os.replace(tmp_path, filename)
+
+
+def retry_delay(attempt, response=None):
+    """Exponential backoff with jitter, or the server's Retry-After when it sends one (in seconds)."""
+    if response is not None and response.headers.get("retry-after", "").isdigit():
+        return min(float(response.headers["retry-after"]), MAX_RETRY_DELAY_SECONDS)
+    return min(BACKOFF_SECONDS * 2 ** attempt * (0.5 + random.random()), MAX_RETRY_DELAY_SECONDS)
+
+
+async def fetch(client, bucket, url):
+    """The body at url, retrying timeouts, connection errors and 429/5xx answers with backoff."""
+    for attempt in range(MAX_ATTEMPTS):
+        await bucket.acquire()
+        response = None
+        try:
+            response = await client.get(url)
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response.content
+        except httpx.TransportError:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+        if attempt < MAX_ATTEMPTS - 1:
+            await asyncio.sleep(retry_delay(attempt, response))
+    response.raise_for_status()
 
 
 def download_images(bulk_file_name, force_download=False):
-
-    with open(bulk_file_name, "r", encoding="utf-8") as f:
-        scryfall_dump = json.load(f)
-
-    def card_name_to_file_name(card_name):
-        card_name = card_name.replace(" ", "-")
-
-        card_name = "".join([char for char in card_name if char in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"])
-
-        while "--" in card_name:
-            card_name = card_name.replace("--", "-")
-        while card_name.startswith("-"):
-            card_name = card_name[1:]
-        while card_name.endswith("-"):
-            card_name = card_name[:-1]
-        return card_name.strip("-").lower()
-
-
-    def download_image(url, filename):
-        img = Image.open(requests.get(url, stream=True).raw)
-        img.save(filename, "WEBP", quality=80)
-        img.close()
-
-    def e2e_download_worker(q: queue.Queue, pbar: tqdm, force_download: bool):
-        while not q.empty():
+    """Downloads the images of a bulk file; reads it as a stream to collect the jobs."""
+    image_jobs = {}
+    for card in iter_bulk_cards(bulk_file_name):
+        job = image_job(card)
+        if job is not None:
+            image_jobs.setdefault(job[1], job[0])
+    download_image_jobs(image_jobs, force_download)
+
+
+def read_image_sources():
+    try:
+        with open(IMAGE_SOURCES_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_image_sources(sources):
+    tmp_path = IMAGE_SOURCES_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(sources, f, ensure_ascii=False)
+    os.replace(tmp_path, IMAGE_SOURCES_PATH)
+
+
+def pending_image_jobs(image_jobs, sources, force_download=False):
+    """
+    The (file name, url) jobs whose image is missing or was downloaded from another url
+    (Scryfall changes the url when it updates an image). Images that exist but predate
+    the sources file are taken as current and recorded in sources.
+    """
+    pending = []
+    for file_name, url in image_jobs.items():
+        recorded = sources.get(file_name)
+        if not force_download:
+            if recorded == url:
+                continue
+            if recorded is None and os.path.exists(f"{IMAGES_DIR}/{file_name}"):
+                sources[file_name] = url
+                continue
+        pending.append((file_name, url))
+    return pending
+
+
+def download_image_jobs(image_jobs, force_download=False, concurrency=MAX_CONCURRENT_DOWNLOADS, rate=REQUESTS_PER_SECOND):
+    """
+    Downloads images/<file name> from its url for each job (file name -> url) that is not up to date,
+    at most `concurrency` at a time over one pooled HTTP client and at most `rate` requests a second.
+    """
+    if not os.path.exists(IMAGES_DIR):
+        os.makedirs(IMAGES_DIR)
+    sources = read_image_sources()
+    pending = pending_image_jobs(image_jobs, sources, force_download)
+    failed = asyncio.run(_download_all(pending, sources, concurrency, rate))
+    print(f"Image download process completed ({len(pending) - failed} downloaded, {failed} failed).")
+    return failed
+
+
+async def _download_all(jobs, sources, concurrency, rate):
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    bucket = TokenBucket(rate)
+    progress_bar = tqdm(total=len(jobs), desc="Downloading Images")
+    failed = 0
+    saved_at = time.monotonic()
+
+    async def worker(client):
+        nonlocal failed, saved_at
+        while not queue.empty():
+            file_name, url = queue.get_nowait()
             try:
-                card = q.get_nowait()
-                if "image_uris" not in card:
-                    card["image_uris"] = {
-                        "normal": card["card_faces"][0]["image_uris"]["normal"] if "card_faces" in card and len(card["card_faces"]) > 0 else ""
-                    }
-                
-                if not card["image_uris"].get("normal"):
-                    # print(f"Skipping {card.get('name', 'Unknown Card')} due to missing image URI.")
-                    pbar.update(1)
-                    q.task_done()
-                    continue
-
-                url = card["image_uris"]["normal"]
-                name = card_name_to_file_name(card["name"] + "-" + card.get("type_line", card.get("card_faces", [{}])[0].get("type_line", "")))
-
-                filename = f"./images/{name}.webp"
-                
-                # Skip if file already exists
-                if os.path.exists(filename) and not force_download:
-                    pbar.update(1)
-                    q.task_done()
-                    continue
-                    
-                download_image(url, filename)
-                pbar.update(1)
-                q.task_done()
-            except queue.Empty:
-                break
+                content = await fetch(client, bucket, url)
+                # decoding and encoding is CPU work, kept off the event loop
+                await asyncio.to_thread(convert_image, content, f"{IMAGES_DIR}/{file_name}")
+                sources[file_name] = url
             except Exception as e:
-                print(f"Error downloading {card.get('name', 'Unknown Card')}: {e}")
-                pbar.update(1)
-                q.task_done()
-
-    NUM_THREADS = 100
-    card_queue = queue.Queue()
-
-    if not os.path.exists("./images"):
-        os.makedirs("./images")
-
-    for card_data in scryfall_dump:
-        if card_data.get("lang", "en") != "en":
-            continue
-        if card_data.get("promo", False):
-            continue
-        card_queue.put(card_data)
-
-    progress_bar = tqdm(total=card_queue.qsize(), desc="Downloading Images")
-
-    threads = []
-    for _ in range(NUM_THREADS):
-        thread = threading.Thread(target=e2e_download_worker, args=(card_queue, progress_bar, force_download))
-        thread.start()
-        threads.append(thread)
-
-    for thread in threads:
-        thread.join()
-
-    progress_bar.close()
-    print("Image download process completed.")
+                print(f"Error downloading {file_name}: {e}")
+                failed += 1
+            progress_bar.update(1)
+            if time.monotonic() - saved_at > SAVE_PROGRESS_SECONDS:
+                saved_at = time.monotonic()
+                write_image_sources(sources)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(limits=limits, headers=HEADERS, timeout=30, follow_redirects=True) as client:
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    finally:
+        write_image_sources(sources)
+        progress_bar.close()
+    return failed
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -102,4 +180,4 @@ if __name__ == "__main__":
 
     bulk_file_name = sys.argv[1]
     force_download = sys.argv[2].lower() == "true" if len(sys.argv) > 2 else False
-    download_images(bulk_file_name, force_download)
\ No newline at end of file
+    download_images(bulk_file_name, force_download)
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from collections import defaultdict
+from functools import partial
+from typing import Any, Dict, Optional
+
+
+Event = Dict[str, Any]
+
+LOBBY_CHANNEL = "lobbies"
+KEEPALIVE_SECONDS = 15
+RELAY_INTERVAL_SECONDS = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+class DraftEventHub:
+    """
+    Pushes draft changes (players joined, pack rotated, player picked, draft finished)
+    to the Server-Sent Events streams subscribed to a channel (a session id or LOBBY_CHANNEL).
+
+    With a single process, events go straight to the subscribers' queues. When the draft
+    store is shared between worker processes, events are appended to the store and every
+    worker relays new ones to its own subscribers, so a pick handled by one worker
+    reaches players connected to another. Either way, events published inside a store
+    edit() only go out if the edit commits.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers: Dict[str, set] = defaultdict(set)
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        if self.store.shared:
+            loop.create_task(self._relay(self.store.last_event_id()))
+
+    def publish(self, channel: str, event: Event) -> None:
+        """Safe to call from any thread, e.g. from work running on the query executor."""
+        if self.store.shared:
+            self.store.append_event(channel, event)
+        elif self.loop is not None:
+            # like the shared store's transaction, an edit that raises sends none of its events
+            self.store.on_commit(partial(self.loop.call_soon_threadsafe, self._deliver, channel, event))
+
+    def _deliver(self, channel: str, event: Event) -> None:
+        for queue in self.subscribers.get(channel, ()):
+            queue.put_nowait(event)
+
+    async def _relay(self, last_id: int) -> None:
+        while True:
+            await asyncio.sleep(RELAY_INTERVAL_SECONDS)
+            try:
+                events = await asyncio.to_thread(self.store.events_since, last_id)
+            except Exception:
+                logger.exception("Error relaying draft events")
+                continue
+            for event_id, channel, event in events:
+                last_id = event_id
+                self._deliver(channel, event)
+
+    def subscribe(self, channel: str) -> "Subscription":
+        """Registers right away, so nothing published after this call is missed."""
+        return Subscription(self, channel)
+
+
+class Subscription:
+    """Async iterator over a channel's events; yields None every KEEPALIVE_SECONDS of silence."""
+
+    def __init__(self, hub: DraftEventHub, channel: str):
+        self.hub = hub
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue()
+        hub.subscribers[channel].add(self.queue)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Optional[Event]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        queues = self.hub.subscribers.get(self.channel)
+        if queues is not None:
+            queues.discard(self.queue)
+            if not queues:
+                del self.hub.subscribers[self.channel]
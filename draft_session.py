@@ -0,0 +1,171 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+# how long a session may sit without any activity before it is dropped, by status
+IDLE_TTL_SECONDS = {
+    "lobby": 30 * 60,
+    "picking": 2 * 60 * 60,
+    "finished": 15 * 60,  # time to look at and copy the decklist
+}
+
+class DraftPlayer:
+    """A seat at the draft. The current pack is an insertion-ordered dict of card ids, so picks are O(1)."""
+    __slots__ = ("id", "name", "is_host", "picked_cards", "current_pack", "has_picked")
+
+    def __init__(self, player_id: str, name: str, is_host: bool = False):
+        self.id = player_id
+        self.name = name
+        self.is_host = is_host
+        self.picked_cards: List[int] = []
+        self.current_pack: Dict[int, None] = {}
+        self.has_picked = False
+
+    def public_view(self) -> Dict[str, Any]:
+        return {"id": self.id, "is_host": self.is_host, "name": self.name}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "is_host": self.is_host,
+            "picked_cards": self.picked_cards,
+            "current_pack": list(self.current_pack),
+            "has_picked": self.has_picked,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DraftPlayer":
+        player = cls(data["id"], data["name"], data["is_host"])
+        player.picked_cards = data["picked_cards"]
+        player.current_pack = dict.fromkeys(data["current_pack"])
+        player.has_picked = data["has_picked"]
+        return player
+
+
+class DraftSession:
+    """
+    One draft: players in seat order and by id, the generated packs, and the number
+    of picks still outstanding in the current round, so a pick never scans the table.
+    Card ids are row ids of the card data version the draft was created with (data_version).
+    Mutate it only while holding lock (the draft stores' edit() does that).
+    """
+    __slots__ = ("id", "set_code", "num_packs", "booster_type", "data_version", "status", "current_pack_number",
+                 "players", "players_by_id", "all_packs", "outstanding_picks", "last_active", "lock")
+
+    MAX_PLAYERS = 8
+
+    def __init__(self, session_id: str, set_code: str, num_packs: int = 3, booster_type: str = "draft", data_version: str = ""):
+        self.id = session_id
+        self.set_code = set_code
+        self.num_packs = num_packs
+        self.booster_type = booster_type
+        self.data_version = data_version
+        self.status = "lobby"  # lobby, picking, finished
+        self.current_pack_number = 0
+        self.players: List[DraftPlayer] = []
+        self.players_by_id: Dict[str, DraftPlayer] = {}
+        self.all_packs: List[List[List[int]]] = []
+        self.outstanding_picks = 0
+        self.last_active = time.time()
+        self.lock = threading.Lock()
+
+    def add_player(self, player_id: str, name: str, is_host: bool = False) -> DraftPlayer:
+        player = DraftPlayer(player_id, name, is_host)
+        self.players.append(player)
+        self.players_by_id[player_id] = player
+        return player
+
+    def player(self, player_id: str) -> Optional[DraftPlayer]:
+        return self.players_by_id.get(player_id)
+
+    def is_full(self) -> bool:
+        return len(self.players) >= self.MAX_PLAYERS
+
+    def start(self, all_packs: List[List[List[int]]]) -> None:
+        """all_packs holds one pack per player for each round."""
+        self.all_packs = all_packs
+        self.status = "picking"
+        self.current_pack_number = 1
+        self._deal(all_packs[0])
+
+    def _deal(self, packs: List[List[int]]) -> None:
+        for player, pack in zip(self.players, packs):
+            player.current_pack = dict.fromkeys(pack)
+        self._new_round()
+
+    def _new_round(self) -> None:
+        for player in self.players:
+            player.has_picked = False
+        self.outstanding_picks = len(self.players)
+
+    def pick(self, player: DraftPlayer, card_id: int) -> bool:
+        """
+        Moves the card from the player's pack to their picks. Once everyone has picked,
+        passes the packs on (or opens the next round, or finishes the draft) and returns True.
+        """
+        del player.current_pack[card_id]
+        player.picked_cards.append(card_id)
+        player.has_picked = True
+        self.outstanding_picks -= 1
+        if self.outstanding_picks > 0:
+            return False
+
+        if player.current_pack:  # cards left to pass
+            packs = [p.current_pack for p in self.players]
+            # Pass clockwise for odd packs, counter-clockwise for even packs
+            shift = 1 if self.current_pack_number % 2 != 0 else -1
+            for i, p in enumerate(self.players):
+                p.current_pack = packs[(i - shift) % len(packs)]
+            self._new_round()
+        else:  # End of a pack
+            self.current_pack_number += 1
+            if self.current_pack_number > self.num_packs:
+                self.status = "finished"
+            else:
+                self._deal(self.all_packs[self.current_pack_number - 1])
+        return True
+
+    def touch(self) -> None:
+        self.last_active = time.time()
+
+    def expires_at(self) -> float:
+        return self.last_active + IDLE_TTL_SECONDS[self.status]
+
+    def public_view(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "set_code": self.set_code,
+            "players": [p.public_view() for p in self.players],
+            "status": self.status,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "set_code": self.set_code,
+            "num_packs": self.num_packs,
+            "booster_type": self.booster_type,
+            "data_version": self.data_version,
+            "status": self.status,
+            "current_pack_number": self.current_pack_number,
+            "players": [p.to_dict() for p in self.players],
+            "all_packs": self.all_packs,
+            "outstanding_picks": self.outstanding_picks,
+            "last_active": self.last_active,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DraftSession":
+        session = cls(data["id"], data["set_code"], data["num_packs"], data["booster_type"], data.get("data_version", ""))
+        session.status = data["status"]
+        session.current_pack_number = data["current_pack_number"]
+        for player_data in data["players"]:
+            player = DraftPlayer.from_dict(player_data)
+            session.players.append(player)
+            session.players_by_id[player.id] = player
+        session.all_packs = data["all_packs"]
+        session.outstanding_picks = data["outstanding_picks"]
+        session.last_active = data.get("last_active", session.last_active)
+        return session
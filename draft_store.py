@@ -0,0 +1,229 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from draft_session import DraftSession
+
+
+MAX_SESSIONS = 1000
+
+
+class DraftStoreFull(Exception):
+    """Raised by create() when MAX_SESSIONS unexpired sessions already exist."""
+
+    def __init__(self):
+        super().__init__(f"Too many active drafts (at most {MAX_SESSIONS})")
+
+
+class MemoryDraftStore:
+    """
+    Draft sessions kept in this process. Only valid with a single server worker.
+    Open lobbies are indexed separately, so listing them does not scan every session.
+    """
+    shared = False
+
+    def __init__(self):
+        self.sessions: Dict[str, DraftSession] = {}
+        self.lobby_ids: Dict[str, None] = {}  # insertion-ordered set
+        self.lock = threading.Lock()
+        self.local = threading.local()  # on_commit() callbacks of the edit running on this thread
+
+    def create(self, session: DraftSession) -> None:
+        if len(self.sessions) >= MAX_SESSIONS:
+            self.sweep()
+        with self.lock:
+            if len(self.sessions) >= MAX_SESSIONS:
+                raise DraftStoreFull()
+            self.sessions[session.id] = session
+            if session.status == "lobby":
+                self.lobby_ids[session.id] = None
+
+    def get(self, session_id: str) -> Optional[DraftSession]:
+        return self.sessions.get(session_id)
+
+    @contextmanager
+    def edit(self, session_id: str) -> Iterator[Optional[DraftSession]]:
+        """
+        Yields the session (or None) for a read-modify-write that no other request to that session
+        interleaves with. Callbacks passed to on_commit() in the block run once it exits without raising.
+        """
+        outer = getattr(self.local, "pending", None)
+        self.local.pending = pending = []
+        try:
+            session = self.sessions.get(session_id)
+            if session is None:
+                yield None
+            else:
+                with session.lock:
+                    yield session
+                    session.touch()
+                    if session.status != "lobby":
+                        with self.lock:
+                            self.lobby_ids.pop(session_id, None)
+        finally:
+            self.local.pending = outer
+        for callback in pending:
+            self.on_commit(callback)
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """Runs callback once the edit() in progress on this thread succeeds (never if it raises), or right away outside one."""
+        pending = getattr(self.local, "pending", None)
+        if pending is None:
+            callback()
+        else:
+            pending.append(callback)
+
+    @contextmanager
+    def read(self, session_id: str) -> Iterator[Optional[DraftSession]]:
+        """Yields the session (or None) with no edit in progress while the block runs."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            yield None
+            return
+        with session.lock:
+            yield session
+
+    def lobbies(self) -> List[DraftSession]:
+        with self.lock:
+            return [self.sessions[session_id] for session_id in self.lobby_ids]
+
+    def sweep(self) -> List[str]:
+        """Drops the sessions idle past their TTL and returns their ids."""
+        now = time.time()
+        with self.lock:
+            expired = [session_id for session_id, session in self.sessions.items() if session.expires_at() < now]
+            for session_id in expired:
+                del self.sessions[session_id]
+                self.lobby_ids.pop(session_id, None)
+        return expired
+
+    def data_versions(self) -> set:
+        """The card data versions the sessions were created with."""
+        with self.lock:
+            return {session.data_version for session in self.sessions.values()}
+
+
+class SqliteDraftStore:
+    """
+    Draft sessions in a SQLite file, so every worker process sees the same drafts.
+    Sessions are stored as JSON; edits run inside an IMMEDIATE transaction, which
+    serializes concurrent picks across processes.
+    It also carries the draft event log that workers relay to their push subscribers.
+    """
+    shared = True
+    EVENT_RETENTION_SECONDS = 600
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.local = threading.local()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS draft_sessions (id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, expires REAL NOT NULL DEFAULT 0)")
+            if "expires" not in {row[1] for row in db.execute("PRAGMA table_info(draft_sessions)")}:
+                # files written before sessions expired; 0 lets the next sweep clear their leftovers
+                db.execute("ALTER TABLE draft_sessions ADD COLUMN expires REAL NOT NULL DEFAULT 0")
+            db.execute("CREATE INDEX IF NOT EXISTS draft_sessions_status ON draft_sessions (status)")
+            db.execute("CREATE INDEX IF NOT EXISTS draft_sessions_expires ON draft_sessions (expires)")
+            db.execute("CREATE TABLE IF NOT EXISTS draft_events (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, data TEXT NOT NULL, created REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None:
+            # autocommit mode; transactions are opened explicitly in edit()
+            db = sqlite3.connect(self.file_path, timeout=30, isolation_level=None)
+            self.local.db = db
+        return db
+
+    def create(self, session: DraftSession) -> None:
+        for attempt in range(2):
+            # the count and the insert are one statement, so concurrent workers cannot overshoot the cap
+            inserted = self._connect().execute(
+                "INSERT INTO draft_sessions (id, status, data, expires) SELECT ?, ?, ?, ? "
+                "WHERE (SELECT COUNT(*) FROM draft_sessions) < ?",
+                (session.id, session.status, json.dumps(session.to_dict()), session.expires_at(), MAX_SESSIONS),
+            ).rowcount
+            if inserted:
+                return
+            if attempt == 0:
+                self.sweep()
+        raise DraftStoreFull()
+
+    def get(self, session_id: str) -> Optional[DraftSession]:
+        row = self._connect().execute("SELECT data FROM draft_sessions WHERE id = ?", (session_id,)).fetchone()
+        return DraftSession.from_dict(json.loads(row[0])) if row else None
+
+    @contextmanager
+    def edit(self, session_id: str) -> Iterator[Optional[DraftSession]]:
+        """
+        Like MemoryDraftStore.edit; the session is written back when the block exits, in the
+        same transaction as events appended inside it. Reads inside the block still see the old row.
+        """
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT data FROM draft_sessions WHERE id = ?", (session_id,)).fetchone()
+            session = DraftSession.from_dict(json.loads(row[0])) if row else None
+            yield session
+            if session is not None:
+                session.touch()
+                db.execute(
+                    "UPDATE draft_sessions SET status = ?, data = ?, expires = ? WHERE id = ?",
+                    (session.status, json.dumps(session.to_dict()), session.expires_at(), session_id),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    @contextmanager
+    def read(self, session_id: str) -> Iterator[Optional[DraftSession]]:
+        # every get() decodes a private copy, no lock needed
+        yield self.get(session_id)
+
+    def lobbies(self) -> List[DraftSession]:
+        rows = self._connect().execute("SELECT data FROM draft_sessions WHERE status = 'lobby'").fetchall()
+        return [DraftSession.from_dict(json.loads(row[0])) for row in rows]
+
+    def sweep(self) -> List[str]:
+        """Drops the sessions idle past their TTL and returns their ids."""
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in db.execute("SELECT id FROM draft_sessions WHERE expires < ?", (now,))]
+            db.execute("DELETE FROM draft_sessions WHERE expires < ?", (now,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return expired
+
+    def data_versions(self) -> set:
+        """The card data versions the sessions were created with."""
+        rows = self._connect().execute("SELECT DISTINCT json_extract(data, '$.data_version') FROM draft_sessions").fetchall()
+        return {row[0] or "" for row in rows}
+
+    def append_event(self, channel: str, event: Dict[str, Any]) -> None:
+        db = self._connect()
+        now = time.time()
+        db.execute("INSERT INTO draft_events (channel, data, created) VALUES (?, ?, ?)", (channel, json.dumps(event), now))
+        db.execute("DELETE FROM draft_events WHERE created < ?", (now - self.EVENT_RETENTION_SECONDS,))
+
+    def last_event_id(self) -> int:
+        row = self._connect().execute("SELECT MAX(id) FROM draft_events").fetchone()
+        return row[0] or 0
+
+    def events_since(self, event_id: int) -> List[tuple]:
+        rows = self._connect().execute(
+            "SELECT id, channel, data FROM draft_events WHERE id > ? ORDER BY id", (event_id,)
+        ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+
+def open_draft_store(file_path: str = "") -> MemoryDraftStore | SqliteDraftStore:
+    if file_path:
+        return SqliteDraftStore(file_path)
+    return MemoryDraftStore()
@@ -0,0 +1,72 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+
+LOG_LEVEL_ENV = "LOCAL_SCRYFALL_LOG_LEVEL"
+LOG_FORMAT_ENV = "LOCAL_SCRYFALL_LOG_FORMAT"  # "text" (default) or "json"
+
+_listener: Optional[QueueListener] = None
+
+
+def fields(**values: Any) -> Dict[str, Any]:
+    """Structured values for a log call: logger.info("Search", extra=fields(query=q, total=n))."""
+    return {"fields": values}
+
+
+class TextFormatter(logging.Formatter):
+    """`time level logger: message key=value ...`"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        values = getattr(record, "fields", None)
+        if values:
+            line += " " + " ".join(f"{key}={value!r}" for key, value in values.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log collectors."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: Optional[str] = None, log_format: Optional[str] = None) -> None:
+    """
+    Routes every log record through a queue to a background thread that does the
+    writing, so request handlers never block on stderr. Levels gate records before
+    any formatting. Defaults come from LOCAL_SCRYFALL_LOG_LEVEL / LOCAL_SCRYFALL_LOG_FORMAT.
+    Calling it again does nothing.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    level = (level or os.environ.get(LOG_LEVEL_ENV, "INFO")).upper()
+    log_format = log_format or os.environ.get(LOG_FORMAT_ENV, "text")
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(records)]
+    root.setLevel(level)
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
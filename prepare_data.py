@@ -1,62 +1,110 @@
 import json
-from tqdm import tqdm
-
-def card_name_to_file_name(card_name):
-    card_name = card_name.replace(" ", "-")
-
-    card_name = "".join([char for char in card_name if char in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"])
-
-    while "--" in card_name:
-        card_name = card_name.replace("--", "-")
-    while card_name.startswith("-"):
-        card_name = card_name[1:]
-    while card_name.endswith("-"):
-        card_name = card_name[:-1]
-    return card_name.strip("-").lower()
-
-def prepare_card_data(bulk_file_name):
-
-    with open(bulk_file_name, "r", encoding="utf-8") as f:
-        cards = json.load(f)
-
-    data_out = []
-
-    for card in tqdm(cards):
-        data_out.append({
-            "name": card["name"],
-            "safe_name": card_name_to_file_name(card["name"]),
-            "file_name": card_name_to_file_name(card["name"] + "-" + card.get("type_line", card.get("card_faces", [{}])[0].get("type_line", ""))) + ".webp",
-            "released-at": card["released_at"],
-            "year": int(card["released_at"].split("-")[0]),
-            "mana_cost": card.get("mana_cost", card.get("card_faces", [{}])[0].get("mana_cost", "")),
-            "cmc": card.get("cmc", card.get("card_faces", [{}])[0].get("cmc", 0)),
-            "type_line": card.get("type_line", card.get("card_faces", [{}])[0].get("type_line", "")),
-            "oracle_text": card.get("oracle_text", card.get("card_faces", [{}])[0].get("oracle_text", "")),
-            "power": card.get("power", card.get("card_faces", [{}])[0].get("power", "")),
-            "toughness": card.get("toughness", card.get("card_faces", [{}])[0].get("toughness", "")),
-            "loyalty": card.get("loyalty", card.get("card_faces", [{}])[0].get("loyalty", "")),
-            "colors": card.get("colors", card.get("card_faces", [{}])[0].get("colors", [])),
-            "color_identity": card.get("color_identity", []),
-            "keywords": card.get("keywords", []),
-            "set": [card.get("set", "")],
-            "rarity": card.get("rarity", ""),
-            "edhrec_rank": card.get("edhrec_rank", 0),
-            "price_euro": card.get("prices", {}).get("eur", 0.0),
-            "price_usd": card.get("prices", {}).get("usd", 0.0),
-            "legal_formats": [fmt_str for fmt_str, legal in card.get("legalities", {}).items() if legal == "legal"],
-        })
-
-    names_to_card = {}
-    for card in data_out:
-        safe_name = card["safe_name"]
-        if not safe_name in names_to_card:
-            names_to_card[safe_name] = card
-        else:
-            names_to_card[safe_name]["set"].extend(card["set"])
-            names_to_card[safe_name]["set"] = list(set(names_to_card[safe_name]["set"]))
-
-    data_out = list(names_to_card.values())
-
-    with open("./cards.json", "w", encoding="utf-8") as f:
-        json.dump(data_out, f, indent=4, ensure_ascii=False)
+import os
+from bulk_ingest import card_name_to_file_name, ingest_bulk_file, parse_price  # the helpers stay importable from here
+from card_snapshot import load_snapshot, read_snapshot_metadata, read_snapshot_version, write_snapshot
+from scryfall_bulk_importer import data_version, load_data, snapshot_path, write_store_snapshot
 
+CARDS_PATH = "./cards.json"
+# snapshot metadata key: updated_at of the Scryfall bulk file the data was built from
+BULK_UPDATED_AT = "bulk_updated_at"
+
+
+def prepare_card_data(bulk_file_name, updated_at: str = "") -> dict[str, str]:
+    """
+    Builds cards.json and its snapshot from a Scryfall bulk file in a single streaming
+    pass. Returns the image jobs (file name -> url) found on the way, for download_image_jobs.
+    """
+    data_out, image_jobs = ingest_bulk_file(bulk_file_name)
+    write_card_data(data_out, updated_at)
+    return image_jobs
+
+
+def update_card_data(bulk_file_name, updated_at: str = "") -> tuple[int, dict[str, str]]:
+    """
+    Incremental prepare_card_data: compares the bulk file's cards with cards.json by
+    safe_name, keeps the order of cards.json and appends new cards. Row ids still shift
+    when a card is removed; drafts keep the data version they were created with instead.
+    cards.json is rewritten if anything changed, which with default_cards (prices change
+    daily) is nearly every run; when no card was added or removed, only the snapshot
+    columns that changed (usually just the prices) are rebuilt. Returns the number of
+    added, changed or removed cards, and all image jobs (download_image_jobs skips the
+    images it already has).
+    """
+    new_cards, image_jobs = ingest_bulk_file(bulk_file_name)
+    try:
+        old_cards = load_data(CARDS_PATH)
+    except FileNotFoundError:
+        old_cards = []
+    cards, changes = merge_card_changes(old_cards, new_cards)
+    if changes or not old_cards:
+        write_card_data(cards, updated_at, changed_card_keys(old_cards, cards))
+    else:
+        set_bulk_updated_at(updated_at)
+    return changes, image_jobs
+
+
+def merge_card_changes(old_cards: list[dict], new_cards: list[dict]) -> tuple[list[dict], int]:
+    """new_cards in the order of old_cards (new names last), and how many cards differ between them."""
+    new_by_name = {card["safe_name"]: card for card in new_cards}
+    cards = []
+    changes = 0
+    for card in old_cards:
+        new_card = new_by_name.pop(card["safe_name"], None)
+        if new_card is None:
+            changes += 1  # no longer in the bulk file
+            continue
+        if new_card != card:
+            changes += 1
+        cards.append(new_card)
+    changes += len(new_by_name)
+    cards.extend(new_by_name.values())
+    return cards, changes
+
+
+def changed_card_keys(old_cards: list[dict], cards: list[dict]) -> set[str] | None:
+    """
+    The keys whose values differ between old_cards and cards row by row, or None if the
+    rows do not hold the same cards with the same keys (a card was added or removed).
+    """
+    if len(old_cards) != len(cards):
+        return None
+    keys = set()
+    for old, new in zip(old_cards, cards):
+        if old == new:
+            continue
+        if old.keys() != new.keys() or old["safe_name"] != new["safe_name"]:
+            return None
+        keys.update(key for key, value in new.items() if old[key] != value)
+    return keys
+
+
+def write_card_data(cards: list[dict], updated_at: str = "", changed_keys: set[str] | None = None) -> None:
+    """
+    Writes cards.json and its snapshot without a running server ever seeing them out of
+    step: cards.json is written under a temporary name, the snapshot is built for it and
+    renamed into place, then cards.json is (a rename keeps the mtime and size its data
+    version is made of). changed_keys: see changed_card_keys.
+    """
+    tmp_path = CARDS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cards, f, indent=4, ensure_ascii=False)
+
+    # binary columns + indexes the server memory-maps at startup
+    write_store_snapshot(CARDS_PATH, cards, {BULK_UPDATED_AT: updated_at}, version_file=tmp_path, changed_keys=changed_keys)
+    os.replace(tmp_path, CARDS_PATH)
+
+
+def read_bulk_updated_at() -> str | None:
+    """updated_at of the bulk file cards.json was last built from, if its snapshot records it."""
+    return read_snapshot_metadata(snapshot_path(CARDS_PATH)).get(BULK_UPDATED_AT)
+
+
+def set_bulk_updated_at(updated_at: str) -> None:
+    # the data version stays the same, so servers that mapped the old snapshot keep using it
+    path = snapshot_path(CARDS_PATH)
+    if read_snapshot_version(path) != data_version(CARDS_PATH):
+        write_store_snapshot(CARDS_PATH, metadata={BULK_UPDATED_AT: updated_at})
+        return
+    store = load_snapshot(path)
+    store.metadata[BULK_UPDATED_AT] = updated_at
+    write_snapshot(store, path)
@@ -0,0 +1,122 @@
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Union
+
+from card_store import COLOR_FIELDS, CardStore
+from query_compiler import compile_filter
+from scryfall_syntax_parser import Filter, LogicalFilter, LogicalOperator, Operator, resolve_key
+
+
+def canonical_key(expr: Union[Filter, LogicalFilter]) -> tuple:
+    """
+    Hashable form of a filter tree that is equal for queries with equal results:
+    short hands resolved, case folded where matching ignores case, and
+    AND / OR children flattened, deduplicated and sorted (unless one can fail).
+    """
+    if isinstance(expr, Filter):
+        key = resolve_key(expr.key)
+        value = expr.value
+        if isinstance(value, str):
+            if key in COLOR_FIELDS:
+                value = "".join(sorted(value.upper()))
+            elif expr.operator == Operator.CONTAINS:
+                value = value.lower()
+        return ("filter", key, expr.operator.value, type(value).__name__, value)
+
+    if not expr.filters:
+        return ("AND",)
+    children = [canonical_key(f) for f in expr.filters]
+    if expr.operator == LogicalOperator.NOT:
+        if len(children) == 1 and children[0][0] == "NOT" and len(children[0]) == 2:
+            return children[0][1]
+        return ("NOT", *children)
+
+    operator = expr.operator.value
+    flat = {}
+    for child in children:
+        flat.update(dict.fromkeys(child[1:] if child[0] == operator else (child,)))
+    if len(flat) == 1:
+        return next(iter(flat))
+    if any(map(can_fail, flat)):
+        # check() stops at the first deciding child, so the order decides whether it fails
+        return (operator, *flat)
+    return (operator, *sorted(flat, key=repr))
+
+
+def can_fail(key: tuple) -> bool:
+    """Whether the filter tree of a canonical key raises ValueError for some values, like pow>abc."""
+    if key[0] == "filter":
+        _, field, operator, value_type, _ = key
+        if value_type == "str":
+            return operator not in ("=", "%=") and field not in COLOR_FIELDS
+        return operator == "%="
+    if key[0] == "NOT" and len(key) != 2:
+        return True
+    return any(map(can_fail, key[1:]))
+
+
+class QueryCache:
+    """
+    LRU cache of matching row ids per canonical filter tree.
+    Bounded by entry count and by the memory held by the cached row arrays, and
+    emptied whenever it is used with a store of a different data version.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[tuple, array] = OrderedDict()
+        self.size_bytes = 0
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def rows(self, store: CardStore, filter: Union[Filter, LogicalFilter]) -> array:
+        """Row ids matching filter. The returned array is shared and must not be modified."""
+        key = canonical_key(filter)
+        with self.lock:
+            if store.version != self.version:
+                self._clear()
+                self.version = store.version
+            rows = self.entries.get(key)
+            if rows is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+
+        rows = array("I", compile_filter(filter).rows(store))
+        with self.lock:
+            if store.version == self.version and key not in self.entries:
+                self.entries[key] = rows
+                self.size_bytes += rows.itemsize * len(rows)
+                self._evict()
+        return rows
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes):
+            _, rows = self.entries.popitem(last=False)
+            self.size_bytes -= rows.itemsize * len(rows)
+            self.evictions += 1
+
+    def _clear(self):
+        self.entries.clear()
+        self.size_bytes = 0
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "version": self.version,
+            }
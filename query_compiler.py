@@ -0,0 +1,146 @@
+from typing import Union
+
+from card_store import CardStore, select_rows
+from scryfall_syntax_parser import Filter, LogicalFilter, LogicalOperator
+
+
+# A reached set smaller than 1/SPARSE_RATIO of a column's distinct values is
+# evaluated row by row instead of running the predicate over the whole column.
+SPARSE_RATIO = 4
+NUMBER_SPARSE_RATIO = 32
+
+
+class LeafPlan:
+    """Evaluates a single Filter over its column."""
+
+    def __init__(self, filter: Filter):
+        self.filter = filter
+        self.memo_key = (filter.key, filter.operator, type(filter.value), filter.value)
+
+    def run(self, store: CardStore, reach: int, memo: dict) -> int:
+        if not reach:
+            return 0
+        if self.memo_key in memo:
+            return memo[self.memo_key] & reach
+
+        column = store.column(self.filter.key)
+        if column is None:
+            return 0
+        reach_count = store.count(reach)
+        if column.kind == "number":
+            sparse = reach_count * NUMBER_SPARSE_RATIO < len(column)
+        else:
+            sparse = reach_count * SPARSE_RATIO < len(column.table)
+        if sparse:
+            return select_rows(column, self.filter.check_value, store.rows(reach))
+
+        try:
+            mask = self.filter.select(store)
+        except ValueError:
+            # the predicate fails on some value of the column; check() only fails if a reached row has one
+            return select_rows(column, self.filter.check_value, store.rows(reach))
+        memo[self.memo_key] = mask
+        return mask & reach
+
+
+class AndPlan:
+    def __init__(self, children: list):
+        self.children = children
+
+    def run(self, store: CardStore, reach: int, memo: dict) -> int:
+        for child in self.children:
+            if not reach:
+                break
+            reach = child.run(store, reach, memo)
+        return reach
+
+
+class OrPlan:
+    def __init__(self, children: list):
+        self.children = children
+
+    def run(self, store: CardStore, reach: int, memo: dict) -> int:
+        matched = 0
+        for child in self.children:
+            if not reach:
+                break
+            hit = child.run(store, reach, memo)
+            matched |= hit
+            reach ^= hit
+        return matched
+
+
+class NotPlan:
+    def __init__(self, child):
+        self.child = child
+
+    def run(self, store: CardStore, reach: int, memo: dict) -> int:
+        return reach ^ self.child.run(store, reach, memo)
+
+
+class InvalidPlan:
+    """Node that LogicalFilter.check would reject; only fails once rows actually reach it."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def run(self, store: CardStore, reach: int, memo: dict) -> int:
+        if reach:
+            raise ValueError(self.message)
+        return 0
+
+
+class CompiledQuery:
+    """
+    Plan for a filter tree: every leaf produces a row mask for its column and the
+    masks are combined with AND / OR / NOT. Each node only looks at the rows that
+    can still change the result, mirroring the short-circuiting of LogicalFilter.check.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def run(self, store: CardStore) -> int:
+        return self.root.run(store, store.all, {})
+
+    def rows(self, store: CardStore) -> list[int]:
+        return store.rows(self.run(store))
+
+    def cards(self, store: CardStore) -> list[dict]:
+        return store.cards(self.rows(store))
+
+
+def _compile(expr: Union[Filter, LogicalFilter]):
+    if isinstance(expr, Filter):
+        return LeafPlan(expr)
+    if not isinstance(expr, LogicalFilter):
+        raise ValueError(f"Unknown expression type: {expr}")
+    if not expr.filters:
+        return AndPlan([])
+
+    if expr.operator == LogicalOperator.NOT:
+        if len(expr.filters) != 1:
+            return InvalidPlan("NOT operator requires exactly one filter")
+        child = _compile(expr.filters[0])
+        if isinstance(child, NotPlan):
+            return child.child
+        return NotPlan(child)
+
+    if expr.operator not in (LogicalOperator.AND, LogicalOperator.OR):
+        return InvalidPlan(f"Unsupported logical operator: {expr.operator}")
+    plan_type = AndPlan if expr.operator == LogicalOperator.AND else OrPlan
+    children = []
+    for sub in expr.filters:
+        child = _compile(sub)
+        # (a AND (b AND c)) evaluates like (a AND b AND c)
+        if type(child) is plan_type:
+            children.extend(child.children)
+        else:
+            children.append(child)
+    if len(children) == 1:
+        return children[0]
+    return plan_type(children)
+
+
+def compile_filter(filter: Union[Filter, LogicalFilter]) -> CompiledQuery:
+    return CompiledQuery(_compile(filter))
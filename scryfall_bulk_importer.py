@@ -1,4 +1,11 @@
+import copy
 import json
+import os
+
+from card_index import NameIndex, build_index, build_numeric_indexes, build_text_indexes
+from card_snapshot import load_snapshot, read_snapshot_version, write_snapshot
+from card_store import MISSING, CardStore, build_column
+from set_pools import SetPools
 
 
 # https://scryfall.com/docs/api/bulk-data
@@ -8,3 +15,72 @@ def load_data(file_path: str) -> list[dict]:
         data = json.load(file)
     return data
 
+def data_version(file_path: str) -> str:
+    stat = os.stat(file_path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+def snapshot_path(file_path: str) -> str:
+    return os.path.splitext(file_path)[0] + ".snapshot"
+
+def build_store(cards: list[dict], version: str = "") -> CardStore:
+    store = CardStore.from_cards(cards, version)
+    build_text_indexes(store)
+    build_numeric_indexes(store)
+    store.derived["names"] = NameIndex.from_store(store)
+    store.derived["set_pools"] = SetPools.from_store(store)
+    return store
+
+def patch_store(store: CardStore, cards: list[dict], keys: set[str], version: str) -> CardStore:
+    """
+    The store for cards, which hold the store's cards in the same rows with the same keys
+    and differ only in the values of keys: those columns, their indexes and the lookups
+    built from them are rebuilt, everything else is shared with store.
+    """
+    columns = dict(store.columns)
+    for key in keys:
+        columns[key] = build_column(key, [card.get(key, MISSING) for card in cards])
+    patched = CardStore(store.keys, columns, store.size, version)
+    patched.indexes = dict(store.indexes)
+    patched.metadata = dict(store.metadata)
+    for key in keys:
+        build_index(patched, key)
+    for name, lookup_type in (("names", NameIndex), ("set_pools", SetPools)):
+        lookup = store.derived.get(name)
+        if lookup is None or keys.intersection(lookup_type.SOURCE_KEYS):
+            lookup = lookup_type.from_store(patched)
+        else:
+            lookup = copy.copy(lookup)
+            lookup.version = version
+        patched.derived[name] = lookup
+    return patched
+
+def write_store_snapshot(file_path: str, cards: list[dict] | None = None, metadata: dict | None = None,
+                         version_file: str | None = None, changed_keys: set[str] | None = None) -> CardStore:
+    """
+    Builds the store for a cards.json file and writes its binary snapshot next to it.
+    version_file is where the data version is read from when cards.json is still being
+    written under another name (it is renamed into place afterwards, keeping its mtime and size).
+    changed_keys: cards differ from file_path's current snapshot only in these keys (see
+    patch_store), so only their columns are rebuilt if that snapshot is up to date.
+    """
+    if cards is None:
+        cards = load_data(file_path)
+    version = data_version(version_file or file_path)
+    snapshot = snapshot_path(file_path)
+    if changed_keys is not None and os.path.exists(file_path) and read_snapshot_version(snapshot) == data_version(file_path):
+        store = load_snapshot(snapshot)
+        store = patch_store(store, cards, changed_keys, version) if store.size == len(cards) else build_store(cards, version)
+    else:
+        store = build_store(cards, version)
+    store.metadata["draftable_sets"] = store.derived["set_pools"].draftable_sets()
+    store.metadata.update(metadata or {})
+    write_snapshot(store, snapshot_path(file_path))
+    return store
+
+def load_store(file_path: str) -> CardStore:
+    """Memory-maps the snapshot of file_path if it is up to date, otherwise builds the store from JSON."""
+    version = data_version(file_path)
+    snapshot = snapshot_path(file_path)
+    if read_snapshot_version(snapshot) == version:
+        return load_snapshot(snapshot)
+    return build_store(load_data(file_path), version)
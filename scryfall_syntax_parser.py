@@ -1,14 +1,17 @@
+import logging
 import re
 import sys
 from enum import Enum
+from operator import eq, ge, gt, le, lt
 from typing import Union
 
-def printd(debug_print: bool, *args, **kwargs):
-    if debug_print:
-        print(*args, **kwargs)
-    else:
-        #TODO: log instead of printing (eventually)
-        pass
+from card_store import CardStore
+
+# debug output of filter evaluation; formatted only when DEBUG is enabled for this logger
+logger = logging.getLogger(__name__)
+# filters built with debug_print=True log here, at DEBUG whatever the level of the logger above
+debug_print_logger = logging.getLogger(__name__ + ".debug_print")
+debug_print_logger.setLevel(logging.DEBUG)
 
 
 
@@ -34,12 +37,22 @@ OPERATOR_SYMBOLS = {
     ":": Operator.CONTAINS
 }
 
+# numeric comparisons written as f(filter_value, item_value), for column-wise evaluation
+NUMERIC_COMPARISONS = {
+    Operator.EQUALS: eq,
+    Operator.GREATER_THAN: lt,
+    Operator.LESS_THAN: gt,
+    Operator.GREATER_THAN_OR_EQUAL: le,
+    Operator.LESS_THAN_OR_EQUAL: ge,
+}
+
 
 
 
 class Filter:
     def __init__(self, key: str, value, operator: Operator = Operator.EQUALS, debug_print: bool = False):
         self.debug_print = debug_print
+        self.logger = debug_print_logger if debug_print else logger
         self.key = key
         self.value = value
         self.operator = operator
@@ -47,9 +60,9 @@ class Filter:
     def check(self, item: dict) -> bool:
         if self.key not in item:
             return False
-        
-        item_value = item[self.key]
-        
+        return self.check_value(item[self.key])
+
+    def check_value(self, item_value) -> bool:
         if isinstance(item_value, str) and isinstance(self.value, str):
             match self.operator:
                 case Operator.EQUALS:
@@ -70,20 +83,20 @@ class Filter:
                     case Operator.CONTAINS:
                         match self.key:
                             case "color_identity":
-                                printd(self.debug_print, f"Checking color identity: {item_value} against {search_value}")
+                                self.logger.debug("Checking color identity: %s against %s", item_value, search_value)
                                 return all([v in search_value for v in item_value])
                             case "colors":
-                                printd(self.debug_print, f"Checking colors: {item_value} against {search_value}")
+                                self.logger.debug("Checking colors: %s against %s", item_value, search_value)
                                 return all(v in item_value for v in search_value) or (is_searching_for_colorless and len(item_value) == 0)
                     case Operator.GREATER_THAN:
                         return all(v in item_value for v in search_value) and len(item_value) > len(search_value)
                     case Operator.LESS_THAN:
                         return all([v in search_value for v in item_value]) and len(item_value) < len(search_value)
                     case Operator.GREATER_THAN_OR_EQUAL:
-                        printd(self.debug_print, f"Checking greater than or equal: {item_value} against {search_value}")
+                        self.logger.debug("Checking greater than or equal: %s against %s", item_value, search_value)
                         return (all(v in item_value for v in search_value) and len(item_value) > len(search_value)) or set(search_value) == set(item_value)
                     case Operator.LESS_THAN_OR_EQUAL:
-                        printd(self.debug_print, f"Checking less than or equal: {item_value} against {search_value}")
+                        self.logger.debug("Checking less than or equal: %s against %s", item_value, search_value)
                         return (all(v in search_value for v in item_value) and len(item_value) < len(search_value)) or set(search_value) == set(item_value)
             else:
                 match self.operator:
@@ -109,6 +122,24 @@ class Filter:
         else:
             return False  # Type mismatch or unsupported comparison
 
+    def select(self, store: CardStore) -> int:
+        """Evaluates the filter column-wise and returns the mask of matching rows."""
+        column = store.column(self.key)
+        if column is None:
+            return 0
+        index = store.indexes.get(self.key)
+        if column.kind == "number" and isinstance(self.value, (int, float)) and self.operator in NUMERIC_COMPARISONS:
+            if index is not None:
+                return index.select(self.operator.value, self.value)
+            return column.compare(NUMERIC_COMPARISONS[self.operator], self.value)
+
+        # every text match is also a substring match, so the n-gram index can narrow it down
+        if index is not None and column.kind == "dict" and isinstance(self.value, str) and self.operator in (Operator.EQUALS, Operator.CONTAINS):
+            codes = index.candidates(self.value)
+            if codes is not None:
+                return column.select_codes(self.check_value, codes)
+        return column.select(self.check_value)
+
     def __str__(self):
         return f"Filter(key={self.key}, value={self.value}, operator={self.operator})"
     def __repr__(self):
@@ -125,30 +156,31 @@ class LogicalFilter:
         self.operator = operator
         self.filters = filters if filters is not None else []
         self.debug_print = debug_print
+        self.logger = debug_print_logger if debug_print else logger
 
     def add_filter(self, filter: Union[Filter, 'LogicalFilter']):
         self.filters.append(filter)
     
     def check(self, item: dict) -> bool:
         if not self.filters:
-            printd(self.debug_print, "No filters to check, returning True")
+            self.logger.debug("No filters to check, returning True")
             return True
         
         if self.operator == LogicalOperator.AND:
             for f in self.filters:
                 if not f.check(item):
-                    printd(self.debug_print, f"Filter {f} did not match item {item} for AND operation, returning False")
+                    self.logger.debug("Filter %s did not match item %s for AND operation, returning False", f, item)
                     return False
-            printd(self.debug_print, "All filters matched for AND operation, returning True")
+            self.logger.debug("All filters matched for AND operation, returning True")
             return True
 
 
         elif self.operator == LogicalOperator.OR:
             for f in self.filters:
                 if f.check(item):
-                    printd(self.debug_print, f"Filter {f} matched item {item} for OR operation, returning True")
+                    self.logger.debug("Filter %s matched item %s for OR operation, returning True", f, item)
                     return True
-            printd(self.debug_print, "No filters matched for OR operation, returning False")
+            self.logger.debug("No filters matched for OR operation, returning False")
             return False
 
 
@@ -158,7 +190,7 @@ class LogicalFilter:
             return not self.filters[0].check(item)
         else:
             raise ValueError(f"Unsupported logical operator: {self.operator}")
-    
+
     def __str__(self):
         filters_str = ", ".join(str(f) for f in self.filters)
         return f"LogicalFilter(operator={self.operator}, filters=[{filters_str}])"
@@ -166,19 +198,22 @@ class LogicalFilter:
         return self.__str__()
 
 
-def apply_filters(data: list[dict], filter: Union[Filter, LogicalFilter]) -> list[dict]:
+def apply_filters(data: list[dict] | CardStore, filter: Union[Filter, LogicalFilter]) -> list[dict]:
+    if isinstance(data, CardStore):
+        from query_compiler import compile_filter  # it builds on this module
+        return compile_filter(filter).cards(data)
     return [item for item in data if filter.check(item)]
 
 
 KEY_SHORT_HANDS = { # key: short hands
     "type_line": ("t", "type"),
-    "name": ("n"),
-    "cmc": ("cost"),
-    "keywords": ("kw"),
-    "set": ("s"),
-    "rarity": ("r"),
+    "name": ("n",),
+    "cmc": ("cost",),
+    "keywords": ("kw",),
+    "set": ("s",),
+    "rarity": ("r",),
     "price_euro": ("euro", "eur"),
-    "price_usd": ("usd"),
+    "price_usd": ("usd",),
     "legal_formats": ("f", "format"),
     "power": ("pow", "p"),
     "toughness": ("tough", "to"),
@@ -189,10 +224,18 @@ KEY_SHORT_HANDS = { # key: short hands
     "released-at": ("release", "date")
 }
 
+def resolve_key(key: str) -> str:
+    for shorthand_key, shorthand_values in KEY_SHORT_HANDS.items():
+        if key in shorthand_values:
+            return shorthand_key
+    return key
+
 def query_to_filter(query: str, debug_print: bool = False) -> Union[Filter, LogicalFilter]:
     """
     Parses a query string into a Filter or LogicalFilter object.
     The query string should be in the Scryfall syntax format.
+    With debug_print the returned filters log their evaluation at DEBUG (debug_print_logger),
+    without changing the level of this module's logger.
     Examples:
         --- 1)
         query = "t:creature OR t:planeswalker cmc:4"
@@ -305,25 +348,19 @@ def query_to_filter(query: str, debug_print: bool = False) -> Union[Filter, Logi
                 key, value = part.split(op_symbol, 1)
                 key = key.strip()
 
-                for shorthand_key, shorthand_values in KEY_SHORT_HANDS.items():
-                    if key in shorthand_values:
-                        key = shorthand_key
-                        break
+                key = resolve_key(key)
 
                 value = value.strip()
                 if value.startswith("'") and value.endswith("'"):
-                    value = value[1:-1]
+                    value = value[1:-1].replace("#", " ")
                 elif value.startswith('"') and value.endswith('"'):
-                    value = value[1:-1]
+                    value = value[1:-1].replace("#", " ")
                 elif all(char.isdigit() or char == "." for char in value):
                     value = float(value)
 
                 if key[0] == "-":
                     key = key[1:]
-                    for shorthand_key, shorthand_values in KEY_SHORT_HANDS.items():
-                        if key in shorthand_values:
-                            key = shorthand_key
-                            break
+                    key = resolve_key(key)
                     f = LogicalFilter(LogicalOperator.NOT, [Filter(key, value, op, debug_print)])
                     if filters and isinstance(filters[-1], LogicalFilter):
                         filters[-1].add_filter(f)
@@ -345,9 +382,9 @@ def query_to_filter(query: str, debug_print: bool = False) -> Union[Filter, Logi
 
             value = part.strip()
             if value.startswith("'") and value.endswith("'"):
-                value = value[1:-1]
+                value = value[1:-1].replace("#", " ")
             elif value.startswith('"') and value.endswith('"'):
-                value = value[1:-1]
+                value = value[1:-1].replace("#", " ")
             
             if value.lower() in ["and", "or"]:
                 operator = LogicalOperator.AND if value.lower() == "and" else LogicalOperator.OR
@@ -386,6 +423,10 @@ def print_filters(filter_expr: Union[Filter, LogicalFilter]) -> None:
     """
     Prints the filter expression using symbols: AND '^', OR 'v', NOT '¬'
     """
+    print(format_filters(filter_expr))
+
+def format_filters(filter_expr: Union[Filter, LogicalFilter]) -> str:
+    """The filter expression as text, as shown by print_filters."""
     def _format(expr):
         if isinstance(expr, Filter):
             key = 't' if expr.key == 'type_line' else expr.key
@@ -405,4 +446,4 @@ def print_filters(filter_expr: Union[Filter, LogicalFilter]) -> None:
                 parts.append(s)
             return sep.join(parts)
         raise ValueError(f"Unknown expression type: {expr}")
-    print(_format(filter_expr))
+    return _format(filter_expr)
@@ -1,25 +1,188 @@
-from scryfall_syntax_parser import query_to_filter, apply_filters, print_filters, Filter, LogicalFilter, LogicalOperator, Operator
+from scryfall_syntax_parser import query_to_filter, format_filters, Filter, LogicalFilter, LogicalOperator, Operator
+from query_cache import QueryCache
+from query_compiler import compile_filter
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, JSONResponse, HTMLResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 import uvicorn
+import argparse
+import asyncio
+import json
+import logging
 import os
 import sys
 import re
-from typing import Any, Dict, List, Union
+import hmac
+import threading
+from typing import Any, Dict, Iterable, List, Union
 import random
-from scryfall_bulk_importer import load_data
+from scryfall_bulk_importer import data_version, snapshot_path
+from card_snapshot import read_snapshot_version, write_snapshot
+from draft_store import DraftStoreFull, open_draft_store
+from draft_session import DraftPlayer, DraftSession
+from draft_events import DraftEventHub, LOBBY_CHANNEL
+from bounded_executor import BoundedExecutor, ExecutorSaturated
+from set_pools import SetPools
+from card_data import CardData, CardDataUnavailable
+from card_json import encode_json, splice_json
+from static_files import StaticFiles
+from logging_setup import fields as log_fields, setup_logging
 from functools import lru_cache
 from datetime import datetime
 import uuid
 from pydantic import BaseModel
-from tqdm import tqdm
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
-ALL_CARDS = load_data("./cards.json")
+CARDS_PATH = "./cards.json"
+# the current card data, swapped as a whole by reload_card_data(); read it once per request
+CARD_DATA = CardData.load(CARDS_PATH)
+# earlier versions that draft sessions were created with, kept until those drafts are gone
+PINNED_CARD_DATA: Dict[str, CardData] = {}
+RELOAD_LOCK = threading.Lock()
+# cards.json is checked for a new version this often; POST /api/v1/admin/reload does it right away
+RELOAD_POLL_SECONDS = 5
+# written by download_images.py after each run
+IMAGE_SOURCES_PATH = "images/sources.json"
+# when set, admin endpoints need it as X-Admin-Token; otherwise they only answer local clients
+ADMIN_TOKEN_ENV = "LOCAL_SCRYFALL_ADMIN_TOKEN"
+QUERY_CACHE = QueryCache()
 player_name: str
-draft_sessions: Dict[str, Dict[str, Any]] = {}
+# set to a SQLite file path to share draft sessions between worker processes
+DRAFT_DB_ENV = "LOCAL_SCRYFALL_DRAFT_DB"
+draft_sessions = open_draft_store(os.environ.get(DRAFT_DB_ENV, ""))
+DRAFT_EVENTS = DraftEventHub(draft_sessions)
+# CPU-bound work (query evaluation, pack generation) runs here instead of on the event loop
+QUERY_WORKERS_ENV = "LOCAL_SCRYFALL_QUERY_WORKERS"
+QUERY_QUEUE_ENV = "LOCAL_SCRYFALL_QUERY_QUEUE"
+QUERY_EXECUTOR = BoundedExecutor(int(os.environ.get(QUERY_WORKERS_ENV, 4)), int(os.environ.get(QUERY_QUEUE_ENV, 32)))
+
+SWEEP_INTERVAL_SECONDS = 60
+
+@app.on_event("startup")
+async def start_draft_events():
+    DRAFT_EVENTS.start(asyncio.get_running_loop())
+    asyncio.get_running_loop().create_task(sweep_draft_sessions())
+    asyncio.get_running_loop().create_task(watch_card_data())
+
+async def sweep_draft_sessions():
+    """Drops idle and finished drafts (see draft_session.IDLE_TTL_SECONDS), so memory stays flat."""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+        try:
+            expired = await asyncio.to_thread(draft_sessions.sweep)
+        except Exception:
+            logger.exception("Error sweeping draft sessions")
+            continue
+        if expired:
+            await asyncio.to_thread(publish_expired, expired)
+        try:
+            await asyncio.to_thread(release_pinned_card_data)
+        except Exception:
+            logger.exception("Error releasing card data versions")
+
+def reload_card_data() -> bool:
+    """
+    Loads cards.json (through its snapshot when that is up to date) if its version changed
+    and swaps it in. Everything is built before the swap, off the event loop; requests that
+    already took CARD_DATA finish on the old version, and drafts keep the version they
+    were created with. Returns whether the data changed.
+    """
+    global CARD_DATA
+    with RELOAD_LOCK:
+        if data_version(CARDS_PATH) == CARD_DATA.version:
+            return False
+        data = CardData.load(CARDS_PATH)
+        PINNED_CARD_DATA[CARD_DATA.version] = CARD_DATA
+        CARD_DATA = data
+    # images may have been replaced along with the data
+    STATIC_FILES.clear()
+    logger.info("Reloaded card data", extra=log_fields(version=data.version, cards=len(data.store)))
+    return True
+
+def publish_expired(expired: List[str]) -> None:
+    for session_id in expired:
+        DRAFT_EVENTS.publish(session_id, {"type": "expired"})
+    publish_lobbies()
+
+def release_pinned_card_data() -> None:
+    """Drops the earlier card data versions no draft session uses any more."""
+    in_use = draft_sessions.data_versions()
+    with RELOAD_LOCK:
+        for version in list(PINNED_CARD_DATA):
+            if version not in in_use:
+                del PINNED_CARD_DATA[version]
+
+def card_data_for(version: str) -> CardData:
+    """
+    The card data a draft was created with; its card ids are row ids of that version,
+    so any other version would resolve them to the wrong cards. Raises CardDataUnavailable
+    if this process no longer has it.
+    """
+    data = CARD_DATA
+    if not version or version == data.version:
+        return data
+    pinned = PINNED_CARD_DATA.get(version)
+    if pinned is not None:
+        return pinned
+    # created by another worker that already reloaded
+    if reload_card_data() and CARD_DATA.version == version:
+        return CARD_DATA
+    logger.warning("Draft created with card data this process does not have", extra=log_fields(version=version))
+    raise CardDataUnavailable(version)
+
+def file_mtime(file_path: str) -> int | None:
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except OSError:
+        return None
+
+async def watch_card_data():
+    """
+    Picks up new card data written by update_db.py (every worker process watches for
+    itself), and drops cached static file lookups once new images are downloaded.
+    """
+    images_mtime = file_mtime(IMAGE_SOURCES_PATH)
+    while True:
+        await asyncio.sleep(RELOAD_POLL_SECONDS)
+        try:
+            await asyncio.to_thread(reload_card_data)
+        except Exception:
+            logger.exception("Error reloading card data")
+        mtime = file_mtime(IMAGE_SOURCES_PATH)
+        if mtime != images_mtime:
+            images_mtime = mtime
+            STATIC_FILES.clear()
+
+def check_admin(request: Request, token: str | None) -> None:
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    if expected:
+        if not token or not hmac.compare_digest(token, expected):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=403, detail="Admin endpoints only answer local clients")
+
+@app.post("/api/v1/admin/reload")
+async def admin_reload(request: Request, x_admin_token: str | None = Header(default=None)) -> Dict[str, Any]:
+    """Switches to the card data on disk now instead of at the next poll (each worker process polls on its own)."""
+    check_admin(request, x_admin_token)
+    reloaded = await asyncio.to_thread(reload_card_data)
+    return {"reloaded": reloaded, "version": CARD_DATA.version, "cards": len(CARD_DATA.store)}
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request, exc: ExecutorSaturated) -> JSONResponse:
+    return JSONResponse(
+        {"error": "Server is busy, please retry"},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(CardDataUnavailable)
+async def card_data_unavailable_handler(request, exc: CardDataUnavailable) -> JSONResponse:
+    return JSONResponse({"error": str(exc)}, status_code=410)
 
 class NewDraftRequest(BaseModel):
     set_code: str
@@ -29,38 +192,115 @@ class NewDraftRequest(BaseModel):
 
 class PickCardRequest(BaseModel):
     player_id: str
-    card_safe_name: str
+    card_id: int = -1
+    card_safe_name: str = ""  # older clients pick by name instead of card id
 
 class JoinRequest(BaseModel):
     player_name: str
 
+DEFAULT_PAGE_SIZE = 175
+MAX_PAGE_SIZE = 1000
+
+def parse_fields(fields: str, data: CardData) -> List[str] | None:
+    """Comma separated card keys to return, or None for full cards. Unknown keys are a 400."""
+    keys = [key.strip() for key in fields.split(",") if key.strip()]
+    unknown = [key for key in keys if data.store.column(key) is None]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return keys or None
+
 @app.get("/api/v1/search")
-async def search_cards(q: str) -> Dict[str, Any]:
-    """Search cards using Scryfall-like syntax."""
+async def search_cards(q: str, limit: int = Query(DEFAULT_PAGE_SIZE, ge=0), offset: int = Query(0, ge=0), fields: str = "",
+                       count_only: bool = False) -> Dict[str, Any]:
+    """
+    Search cards using Scryfall-like syntax.
+    Returns one page of `limit` cards starting at `offset`, optionally reduced to
+    the comma separated `fields` (unknown ones are a 400). With count_only only the
+    number of matches is returned.
+    """
+    return await QUERY_EXECUTOR.run(run_search, q, limit, offset, fields, count_only)
+
+def run_search(q: str, limit: int, offset: int, fields: str, count_only: bool) -> Dict[str, Any] | Response:
+    limit = min(limit, MAX_PAGE_SIZE)
+    data = CARD_DATA
+    keys = parse_fields(fields, data)
     try:
         filters = query_to_filter(q, debug_print=False)
-        print_filters(filters)
-        filtered_cards = apply_filters(ALL_CARDS, filters)
-        if not filtered_cards:
-            return {"error": "No cards found matching the query"}
-        return {"cards": filtered_cards}
+        log_query(q, filters)
+        rows = QUERY_CACHE.rows(data.store, filters)
+        total = len(rows)
+        if count_only:
+            return {"total": total}
+        if not total:
+            return {"error": "No cards found matching the query", "total": 0}
+        page = rows[offset:offset + limit]
+        body = splice_json({
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "has_more": offset + len(page) < total,
+        }, "cards", data.card_json.cards(page, keys))
+        return Response(body, media_type="application/json")
     except Exception as e:
+        logger.warning("Failed to process query", extra=log_fields(query=q, error=str(e)))
         return {"error": "Failed to process query", "details": str(e)}
 
+def log_query(q: str, filters) -> None:
+    # formatting the filter tree is only paid for when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Parsed query", extra=log_fields(query=q, filters=format_filters(filters)))
+
+EXPORT_BATCH_SIZE = 64
+
+@app.get("/api/v1/search/export")
+async def export_cards(q: str, fields: str = ""):
+    """Streams every card matching the query as NDJSON (one JSON object per line)."""
+    try:
+        filters = query_to_filter(q, debug_print=False)
+    except Exception as e:
+        return JSONResponse({"error": "Failed to process query", "details": str(e)}, status_code=400)
+    data = CARD_DATA
+    keys = parse_fields(fields, data)
+    store, card_json = data.store, data.card_json
+    # evaluated before the response starts, so a query that fails on the data still gets its 400
+    try:
+        mask = await QUERY_EXECUTOR.run(compile_filter(filters).run, store)
+    except ValueError as e:
+        logger.warning("Failed to process query", extra=log_fields(query=q, error=str(e)))
+        return JSONResponse({"error": "Failed to process query", "details": str(e)}, status_code=400)
+
+    def generate_lines():
+        # runs in Starlette's threadpool; cards are built and encoded one batch at a time
+        rows = store.iter_rows(mask)
+        batch = []
+        for row in rows:
+            batch.append(card_json.card(row) if keys is None else encode_json(store.card(row, keys)))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield b"\n".join(batch) + b"\n"
+                batch = []
+        if batch:
+            yield b"\n".join(batch) + b"\n"
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
 @app.get("/api/v1/random")
 async def get_random_cards(q: str = "", count: int = 1) -> JSONResponse:
     """Get random cards from the database. Supports a count parameter."""
-    if not ALL_CARDS:
+    return await QUERY_EXECUTOR.run(pick_random_cards, q, count)
+
+def pick_random_cards(q: str, count: int) -> JSONResponse:
+    data = CARD_DATA
+    if not data.store:
         return JSONResponse({"error": "No cards available"}, status_code=500)
 
-    filtered_cards_pool = ALL_CARDS
+    filtered_cards_pool = range(len(data.store))
     if q:
         try:
             filters = query_to_filter(q, debug_print=False)
-            print_filters(filters)
-            filtered_cards_pool = apply_filters(ALL_CARDS, filters)
+            log_query(q, filters)
+            filtered_cards_pool = QUERY_CACHE.rows(data.store, filters)
         except Exception as e:
-            print(f"Error processing query '{q}': {e}") # Log error server-side
+            logger.warning("Failed to process query", extra=log_fields(query=q, error=str(e)))
             return JSONResponse({"error": "Failed to process query", "details": str(e)}, status_code=400)
 
     if not filtered_cards_pool:
@@ -69,372 +309,457 @@ async def get_random_cards(q: str = "", count: int = 1) -> JSONResponse:
     if len(filtered_cards_pool) < count:
         return JSONResponse({"error": "Not enough cards available"}, status_code=404)
     
-    random_cards = random.sample(filtered_cards_pool, count)
-    if len(random_cards) == 1:
-        return JSONResponse({"card": random_cards[0]})
-    return JSONResponse({"cards": random_cards})
+    card_json = data.card_json
+    random_rows = random.sample(filtered_cards_pool, count)
+    if len(random_rows) == 1:
+        return Response(splice_json({}, "card", card_json.card(random_rows[0])), media_type="application/json")
+    return Response(splice_json({}, "cards", card_json.cards(random_rows)), media_type="application/json")
+
+@app.get("/api/v1/cache")
+async def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the search result cache."""
+    return QUERY_CACHE.stats()
+
+def data_etag(data: CardData) -> str | None:
+    """Strong ETag for responses that only depend on the URL and the card data version."""
+    return f'"{data.version}"' if data.version else None
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    if not if_none_match or not etag:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+def versioned_response(data: CardData, body: bytes | None, if_none_match: str | None) -> Response:
+    """A JSON response tagged with the version of the data it was made from, or a bodiless 304 when the client already has it."""
+    etag = data_etag(data)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else {}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.get("/api/v1/card/{safe_card_name}")
-async def get_card_by_name(safe_card_name: str) -> Dict[str, Any]:
+async def get_card_by_name(safe_card_name: str, if_none_match: str | None = Header(default=None)) -> Response:
     """Get a card by its name."""
-    for card in ALL_CARDS:
-        if card["safe_name"] == safe_card_name:
-            return {"card": card}
-    return {"error": "Card not found"}
-
-def get_set_codes() -> tuple[str]:
+    data = CARD_DATA
+    row = data.name_index.row(safe_card_name)
+    if row is None:
+        return JSONResponse({"error": "Card not found"}, status_code=404)
+    if etag_matches(if_none_match, data_etag(data)):
+        return versioned_response(data, None, if_none_match)
+    return versioned_response(data, splice_json({}, "card", data.card_json.card(row)), if_none_match)
+
+MAX_AUTOCOMPLETE = 50
+
+@app.get("/api/v1/autocomplete")
+async def autocomplete(q: str, limit: int = 10) -> Dict[str, Any]:
+    """Card names starting with q, or with a word starting with q, for typeahead."""
+    data = CARD_DATA
+    rows = data.name_index.complete(q, max(1, min(limit, MAX_AUTOCOMPLETE)))
+    return {"suggestions": data.store.cards(rows, ["name", "safe_name"])}
+
+def get_set_codes(data: CardData) -> tuple[str]:
     set_set = set()
-    for card in ALL_CARDS:
-        set_set.update(card.get("set", []))
+    for set_codes in data.store.column("set").distinct():
+        set_set.update(set_codes)
     return tuple(sorted(set_set))
 
-def get_set_codes_draftable() -> List[str]:
-    fp = "draftable_sets.txt"
-    if os.path.exists(fp):
-        if os.path.getmtime(fp) > os.path.getmtime("./cards.json"):
-            # If the file is newer than the cards.json, return cached data
-            with open(fp, "r") as f:
-                return [line.strip() for line in f.readlines() if line.strip()]
-    
-
-    set_codes = get_set_codes()
-    ret_set_codes = []
-    for set_code in tqdm(set_codes):
-        for boster_type in ["draft", "set"]:
-            sim_pack = generate_pack(set_code, boster_type)
-            if len(sim_pack) < 15:
-                continue
-            ret_set_codes.append(set_code)
-
-    ret_set_codes = sorted(set(ret_set_codes))
-    with open(fp, "w") as f:
-        for code in ret_set_codes:
-            f.write(f"{code}\n")
-
-    return ret_set_codes
+def get_set_codes_draftable(data: CardData) -> List[str]:
+    # written into the snapshot by prepare_data; otherwise derived from the rarity pools
+    draftable_sets = data.store.metadata.get("draftable_sets")
+    if draftable_sets is None:
+        draftable_sets = data.set_pools.draftable_sets()
+    return draftable_sets
 
 @app.get("/api/v1/sets")
-async def get_sets(only_draftable: bool = False):
+async def get_sets(only_draftable: bool = False, if_none_match: str | None = Header(default=None)) -> Response:
     """Get a list of all sets."""
+    data = CARD_DATA
+    if etag_matches(if_none_match, data_etag(data)):
+        return versioned_response(data, None, if_none_match)
     if only_draftable:
-        return JSONResponse({"sets": get_set_codes_draftable()})
+        return versioned_response(data, encode_json({"sets": get_set_codes_draftable(data)}), if_none_match)
     else:
-        return JSONResponse({"sets": list(get_set_codes())})
+        return versioned_response(data, encode_json({"sets": list(get_set_codes(data))}), if_none_match)
     
-def get_session_public_view(session_id: str):
-    session = draft_sessions.get(session_id)
-    if not session:
-        return None
-    return {
-        "id": session_id,
-        "set_code": session["set_code"],
-        "players": [{"id": p["id"], "is_host": p["is_host"], "name": p["name"]} for p in session["players"]],
-        "status": session["status"]
-    }
-
+# the draft handlers are plain functions, which FastAPI runs in its threadpool: a store call
+# can wait on SQLite's lock held by another worker and must not block the event loop
 @app.post("/api/v1/draft/new")
-async def new_draft(request: NewDraftRequest):
-    session_id = str(uuid.uuid4())
-    player_id = str(uuid.uuid4())
-    
-    draft_sessions[session_id] = {
-        "id": session_id,
-        "set_code": request.set_code,
-        "num_packs": request.num_packs,
-        "booster_type": request.booster_type,
-        "players": [{"id": player_id, "is_host": True, "picked_cards": [], "current_pack": [], "name": request.player_name}],
-        "status": "lobby", # lobby, picking, finished
-        "current_pack_number": 0,
-        "all_packs": []
-    }
-    return {"session_id": session_id, "player_id": player_id, "session": get_session_public_view(session_id)}
+def new_draft(request: NewDraftRequest):
+    session = DraftSession(str(uuid.uuid4()), request.set_code, request.num_packs, request.booster_type, CARD_DATA.version)
+    player = session.add_player(str(uuid.uuid4()), request.player_name, is_host=True)
+    try:
+        draft_sessions.create(session)
+    except DraftStoreFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    publish_lobbies()
+    return {"session_id": session.id, "player_id": player.id, "session": session.public_view()}
 
 @app.get("/api/v1/draft/sessions")
-async def get_sessions():
-    return {"sessions": [get_session_public_view(sid) for sid, s in draft_sessions.items() if s["status"] == "lobby"]}
+def get_sessions():
+    return {"sessions": lobby_views()}
+
+def lobby_views() -> List[Dict[str, Any]]:
+    return [s.public_view() for s in draft_sessions.lobbies()]
+
+def publish_lobbies(edited: DraftSession | None = None):
+    """
+    edited is a session changed inside draft_sessions.edit(); the store only has the
+    change once the block exits, so that session's listing is taken from it instead.
+    """
+    sessions = []
+    for s in draft_sessions.lobbies():
+        if edited is not None and s.id == edited.id:
+            s = edited
+        if s.status == "lobby":
+            sessions.append(s.public_view())
+    DRAFT_EVENTS.publish(LOBBY_CHANNEL, {"type": "lobbies", "sessions": sessions})
+
+def publish_players(session: DraftSession):
+    DRAFT_EVENTS.publish(session.id, {"type": "players", "players": [p.public_view() for p in session.players]})
+
+def publish_packs(session: DraftSession):
+    for player in session.players:
+        DRAFT_EVENTS.publish(session.id, {"type": "pack", "player_id": player.id, "pack": list(player.current_pack)})
+
+def sse_message(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def stream_events(subscription, first_event: Dict[str, Any], player_id: str = "", sent_cards: set | None = None,
+                  data: CardData | None = None):
+    async def generate():
+        try:
+            yield sse_message(first_event)
+            async for event in subscription:
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                # packs are private to the player they were passed to
+                if event["type"] == "pack":
+                    if event["player_id"] != player_id:
+                        continue
+                    event = {**event, "cards": with_card_details(event["pack"], sent_cards, data)}
+                yield sse_message(event)
+                if event["type"] in ("finished", "expired"):
+                    return
+        finally:
+            subscription.close()
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/v1/draft/sessions/events")
+async def get_sessions_events():
+    subscription = DRAFT_EVENTS.subscribe(LOBBY_CHANNEL)
+    try:
+        sessions = await asyncio.to_thread(lobby_views)
+    except BaseException:
+        subscription.close()
+        raise
+    return stream_events(subscription, {"type": "lobbies", "sessions": sessions})
 
 @app.post("/api/v1/draft/{session_id}/join")
-async def join_draft(session_id: str, request: JoinRequest):
-    print
-    session = draft_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if len(session["players"]) >= 8:
-        raise HTTPException(status_code=400, detail="Session is full")
-    if session["status"] != "lobby":
-        raise HTTPException(status_code=400, detail="Draft has already started")
-
-    player_id = str(uuid.uuid4())
-    session["players"].append({"id": player_id, "is_host": False, "picked_cards": [], "current_pack": [], "name": request.player_name})
-    return {"session_id": session_id, "player_id": player_id, "session": get_session_public_view(session_id), "name": request.player_name}
-
-def get_cards_by_rarity(set_cards: List[Dict[str, Any]]):
-    commons = [c for c in set_cards if c.get("rarity") == "common" and "Land" not in c.get("type_line", "")]
-    uncommons = [c for c in set_cards if c.get("rarity") == "uncommon"]
-    rares = [c for c in set_cards if c.get("rarity") == "rare"]
-    mythics = [c for c in set_cards if c.get("rarity") == "mythic"]
-    basic_lands = [c for c in set_cards if c.get("type_line", "").startswith("Basic Land")]
-    return commons, uncommons, rares, mythics, basic_lands
-
-def _add_cards_to_pack(pack: List[Dict[str, Any]], card_pool: List[Dict[str, Any]], count: int):
-    """Helper to add non-duplicate cards to a pack."""
+def join_draft(session_id: str, request: JoinRequest):
+    with draft_sessions.edit(session_id) as session:
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if session.is_full():
+            raise HTTPException(status_code=400, detail="Session is full")
+        if session.status != "lobby":
+            raise HTTPException(status_code=400, detail="Draft has already started")
+
+        player = session.add_player(str(uuid.uuid4()), request.player_name)
+        publish_players(session)
+        publish_lobbies(session)
+        return {"session_id": session_id, "player_id": player.id, "session": session.public_view(), "name": request.player_name}
+
+def _add_cards_to_pack(pack: List[int], in_pack: set, card_pool: List[int], count: int):
+    """Helper to add non-duplicate cards (row ids) to a pack."""
     if not card_pool or count == 0:
         return
-    
-    pack_card_names = {c['name'] for c in pack}
-    available_cards = [c for c in card_pool if c['name'] not in pack_card_names]
-    
-    if len(available_cards) < count:
-        pool_to_sample = available_cards if available_cards else card_pool
-        if not pool_to_sample:
-            return
-        pack.extend(random.choices(pool_to_sample, k=count))
-    else:
-        pack.extend(random.sample(available_cards, k=count))
 
-def generate_set_booster(set_code: str) -> List[Dict[str, Any]]:
-    set_cards = [card for card in ALL_CARDS if set_code in card.get("set", []) and len(card.get("legal_formats", [])) != 0]
-    
-    commons, uncommons, rares, mythics, basic_lands = get_cards_by_rarity(set_cards)
+    # Drawing len(in_pack) extra rows leaves at least `count` rows that are not in the
+    # pack yet whenever the pool has that many, without rebuilding the pool.
+    candidates = random.sample(card_pool, min(len(card_pool), count + len(in_pack)))
+    picked = [row for row in candidates if row not in in_pack][:count]
+    if len(picked) < count:
+        available_cards = [row for row in card_pool if row not in in_pack]
+        picked = random.choices(available_cards if available_cards else card_pool, k=count)
+    pack.extend(picked)
+    in_pack.update(picked)
+
+def generate_set_booster(set_code: str, set_pools: SetPools) -> List[int]:
+    pools = set_pools.get(set_code)
+    commons, uncommons, rares, mythics, basic_lands = pools.commons, pools.uncommons, pools.rares, pools.mythics, pools.basic_lands
     
-    pack: List[Dict[str, Any]] = []
+    pack: List[int] = []
+    in_pack: set = set()
 
     # Slot 1: 6 Commons or uncommons
     c_u_outcomes = [(5, 1), (4, 2), (3, 3), (2, 4), (1, 5), (0, 6)]
     c_u_weights = [35, 40, 12.5, 7, 3.5, 2]
     num_c, num_u = random.choices(c_u_outcomes, weights=c_u_weights, k=1)[0]
-    _add_cards_to_pack(pack, commons, num_c)
-    _add_cards_to_pack(pack, uncommons, num_u)
+    _add_cards_to_pack(pack, in_pack, commons, num_c)
+    _add_cards_to_pack(pack, in_pack, uncommons, num_u)
 
     # Slot 2: 1 Common or uncommon
-    commons_and_uncommons = commons + uncommons
-    _add_cards_to_pack(pack, commons_and_uncommons, 1)
+    _add_cards_to_pack(pack, in_pack, pools.commons_and_uncommons, 1)
 
     # Slot 3: 2 Common or uncommon or rare or mythic rare
     slot3_outcomes = [('C', 'C'), ('C', 'U'), ('C', 'R/M'), ('U', 'U'), ('U', 'R/M'), ('R/M', 'R/M')]
     slot3_weights = [49, 24.5, 17.5, 3.1, 4.3, 1.6]
     card1_type, card2_type = random.choices(slot3_outcomes, weights=slot3_weights, k=1)[0]
     
-    rares_and_mythics = rares + mythics
-    type_map = {'C': commons, 'U': uncommons, 'R/M': rares_and_mythics}
+    type_map = {'C': commons, 'U': uncommons, 'R/M': pools.rares_and_mythics}
     
-    _add_cards_to_pack(pack, type_map[card1_type], 1)
-    _add_cards_to_pack(pack, type_map[card2_type], 1)
+    _add_cards_to_pack(pack, in_pack, type_map[card1_type], 1)
+    _add_cards_to_pack(pack, in_pack, type_map[card2_type], 1)
 
     # Slot 4: 1 Rare or Mythic rare
     if mythics and random.random() < 0.135:
-        _add_cards_to_pack(pack, mythics, 1)
+        _add_cards_to_pack(pack, in_pack, mythics, 1)
     else:
-        _add_cards_to_pack(pack, rares, 1)
+        _add_cards_to_pack(pack, in_pack, rares, 1)
 
     # Slot 5: 1 Anything from common to Mythic rare
-    all_non_land = commons + uncommons + rares + mythics
-    _add_cards_to_pack(pack, all_non_land, 1)
+    _add_cards_to_pack(pack, in_pack, pools.all_non_land, 1)
 
     # Slot 6: 1 Basic Land
     if basic_lands:
-        _add_cards_to_pack(pack, basic_lands, 1)
+        _add_cards_to_pack(pack, in_pack, basic_lands, 1)
     else:
         if commons:
-            _add_cards_to_pack(pack, commons, 1)
+            _add_cards_to_pack(pack, in_pack, commons, 1)
 
     return pack
 
-def generate_draft_booster(set_code: str) -> List[Dict[str, Any]]:
-    set_cards = [card for card in ALL_CARDS if set_code in card.get("set", []) and len(card.get("legal_formats", [])) != 0]
+def generate_draft_booster(set_code: str, set_pools: SetPools) -> List[int]:
+    pools = set_pools.get(set_code)
+    commons, uncommons, rares, mythics, basic_lands = pools.commons, pools.uncommons, pools.rares, pools.mythics, pools.basic_lands
     
-    commons, uncommons, rares, mythics, basic_lands = get_cards_by_rarity(set_cards)
-    
-    pack: List[Dict[str, Any]] = []
-    _add_cards_to_pack(pack, commons, 10)
-    _add_cards_to_pack(pack, uncommons, 3)
+    pack: List[int] = []
+    in_pack: set = set()
+    _add_cards_to_pack(pack, in_pack, commons, 10)
+    _add_cards_to_pack(pack, in_pack, uncommons, 3)
     
     # 1 in 8 packs have a mythic instead of a rare
     if mythics and random.randint(1, 8) == 1:
-        _add_cards_to_pack(pack, mythics, 1)
+        _add_cards_to_pack(pack, in_pack, mythics, 1)
     elif rares:
-        _add_cards_to_pack(pack, rares, 1)
+        _add_cards_to_pack(pack, in_pack, rares, 1)
         
     # Fill remaining slots if any rarity was short
     while len(pack) < 14 and commons:
-        _add_cards_to_pack(pack, commons, 1)
+        _add_cards_to_pack(pack, in_pack, commons, 1)
 
     # Basic lands
     if basic_lands:
-        _add_cards_to_pack(pack, basic_lands, 1)
+        _add_cards_to_pack(pack, in_pack, basic_lands, 1)
     elif commons: # if no basic lands in set, add a common
-        _add_cards_to_pack(pack, commons, 1)
+        _add_cards_to_pack(pack, in_pack, commons, 1)
 
     return pack
 
-def generate_pack(set_code: str, booster_type: str) -> List[Dict[str, Any]]:
+def generate_pack(set_code: str, booster_type: str, set_pools: SetPools) -> List[int]:
+    """A booster as card ids (store row ids); details are sent with get_card_details."""
     if booster_type == "set":
-        pack = generate_set_booster(set_code)
+        pack = generate_set_booster(set_code, set_pools)
     else:
-        pack = generate_draft_booster(set_code)
+        pack = generate_draft_booster(set_code, set_pools)
+
+    # rows are unique per safe_name, so dropping repeated rows keeps one card per name
+    return list(dict.fromkeys(pack))
+
+# what the draft page needs to show and pick a card
+DRAFT_CARD_FIELDS = ["name", "safe_name", "file_name"]
 
-    unique_names = []
-    pack_unique = []
-    for card in pack:
-        safe_name = card.get("safe_name", "")
-        if safe_name not in unique_names:
-            unique_names.append(safe_name)
-            pack_unique.append(card)
-    return pack_unique
+def get_card_details(card_ids: Iterable[int], data: CardData) -> Dict[int, Dict[str, Any]]:
+    return {card_id: data.store.card(card_id, DRAFT_CARD_FIELDS) for card_id in card_ids}
 
 @app.post("/api/v1/draft/{session_id}/start")
 async def start_draft(session_id: str):
-    session = draft_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session["status"] != "lobby":
-        raise HTTPException(status_code=400, detail="Draft already started or finished")
+    return await QUERY_EXECUTOR.run(run_start_draft, session_id)
+
+def run_start_draft(session_id: str) -> Dict[str, str]:
+    with draft_sessions.edit(session_id) as session:
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if session.status != "lobby":
+            raise HTTPException(status_code=400, detail="Draft already started or finished")
+
+        # Generate all packs for the draft; the first round is dealt right away
+        num_players = len(session.players)
+        set_pools = card_data_for(session.data_version).set_pools
+        session.start([
+            [generate_pack(session.set_code, session.booster_type, set_pools) for _ in range(num_players)]
+            for _ in range(session.num_packs)
+        ])
+
+        DRAFT_EVENTS.publish(session_id, {"type": "started"})
+        publish_packs(session)
+        publish_lobbies(session)
+        return {"message": "Draft started"}
 
-    session["status"] = "picking"
-    session["current_pack_number"] = 1
-    
-    for player in session["players"]:
-        player["has_picked_this_round"] = False
+@app.post("/api/v1/draft/{session_id}/pick")
+def pick_card(session_id: str, request: PickCardRequest):
+    with draft_sessions.edit(session_id) as session:
+        if not session or session.status != "picking":
+            raise HTTPException(status_code=404, detail="Invalid session or not in picking phase")
+
+        player = session.player(request.player_id)
+        if not player:
+            raise HTTPException(status_code=404, detail="Player not found")
+        if player.has_picked:
+            raise HTTPException(status_code=400, detail="Already picked from this pack")
+
+        pack = player.current_pack
+        if request.card_safe_name:
+            store = card_data_for(session.data_version).store
+            card_to_pick = next((c for c in pack if store.get(c, "safe_name") == request.card_safe_name), None)
+        else:
+            card_to_pick = request.card_id if request.card_id in pack else None
     
-    # Generate all packs for the draft
-    num_players = len(session["players"])
-    for _ in range(session["num_packs"]):
-        packs_for_round = [generate_pack(session["set_code"], session.get("booster_type", "draft")) for _ in range(num_players)]
-        session["all_packs"].append(packs_for_round)
+        if card_to_pick is None:
+            raise HTTPException(status_code=400, detail="Card not in the current pack")
 
-    # Distribute the first pack to each player
-    first_round_packs = session["all_packs"][0]
-    for i, player in enumerate(session["players"]):
-        player["current_pack"] = first_round_packs[i]
-
-    return {"message": "Draft started"}
-
-@app.post("/api/v1/draft/{session_id}/pick")
-async def pick_card(session_id: str, request: PickCardRequest):
-    session = draft_sessions.get(session_id)
-    if not session or session["status"] != "picking":
-        raise HTTPException(status_code=404, detail="Invalid session or not in picking phase")
+        DRAFT_EVENTS.publish(session_id, {"type": "picked", "player_id": player.id})
+        if session.pick(player, card_to_pick):
+            if session.status == "picking":
+                publish_packs(session)
+            else:
+                DRAFT_EVENTS.publish(session_id, {"type": "finished"})
 
-    player = next((p for p in session["players"] if p["id"] == request.player_id), None)
-    if not player:
-        raise HTTPException(status_code=404, detail="Player not found")
+        return {"message": "Card picked successfully", "card": card_to_pick}
 
-    pack = player["current_pack"]
-    card_to_pick = next((c for c in pack if c["safe_name"] == request.card_safe_name), None)
-    
-    if not card_to_pick:
-        raise HTTPException(status_code=400, detail="Card not in the current pack")
+def get_player_status(session: DraftSession, player: DraftPlayer, sent_cards: set | None = None) -> Dict[str, Any]:
+    """
+    Pack and deck are card ids; "cards" holds the details of ids not in sent_cards
+    (all of them when it is None), which is then updated with the ids sent.
+    """
+    response = {
+        "status": session.status,
+        "players": [p.public_view() for p in session.players],
+    }
 
-    player["picked_cards"].append(card_to_pick)
-    player["current_pack"].remove(card_to_pick)
-    player["has_picked_this_round"] = True
-    
-    # Check if all players have picked
-    all_picked = all(p.get("has_picked_this_round", False) for p in session["players"])
-    
-    if all_picked:
-        # Rotate packs
-        num_players = len(session["players"])
-        if len(player["current_pack"]) > 0: # If there are cards left to pass
-            packs_to_pass = [p["current_pack"] for p in session["players"]]
-            for i in range(num_players):
-                # Pass clockwise for odd packs, counter-clockwise for even packs
-                if session["current_pack_number"] % 2 != 0:
-                    session["players"][i]["current_pack"] = packs_to_pass[(i - 1 + num_players) % num_players]
-                else:
-                    session["players"][i]["current_pack"] = packs_to_pass[(i + 1) % num_players]
-        else: # End of a pack
-            session["current_pack_number"] += 1
-            if session["current_pack_number"] > session["num_packs"]:
-                session["status"] = "finished"
-            else:
-                # Distribute next round of packs
-                next_round_packs = session["all_packs"][session["current_pack_number"] - 1]
-                for i, p in enumerate(session["players"]):
-                    p["current_pack"] = next_round_packs[i]
+    if session.status == "picking":
+        # A player is waiting if they have picked but the packs haven't rotated.
+        if player.has_picked:
+             response["status"] = "waiting"
+        else:
+            response["pack"] = list(player.current_pack)
+    response["deck"] = player.picked_cards
+    data = card_data_for(session.data_version)
+    response["cards"] = with_card_details(response.get("pack", []) + response["deck"], sent_cards, data)
 
-        if session["status"] == "picking":
-            for p in session["players"]:
-                p["has_picked_this_round"] = False
+    return response
 
-    return {"message": "Card picked successfully"}
+def with_card_details(card_ids: List[int], sent_cards: set | None, data: CardData) -> Dict[int, Dict[str, Any]]:
+    if sent_cards is None:
+        return get_card_details(card_ids, data)
+    new_ids = [card_id for card_id in card_ids if card_id not in sent_cards]
+    sent_cards.update(new_ids)
+    return get_card_details(new_ids, data)
 
-@app.get("/api/v1/draft/{session_id}/status")
-async def get_draft_status(session_id: str, player_id: str):
-    session = draft_sessions.get(session_id)
+def find_player(session: DraftSession | None, player_id: str) -> DraftPlayer:
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    player = next((p for p in session["players"] if p["id"] == player_id), None)
+    player = session.player(player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
+    return player
 
-    response = {
-        "status": session["status"],
-        "players": [{"id": p["id"], "is_host": p["is_host"], "name": p["name"]} for p in session["players"]],
-    }
-
-    if session["status"] == "picking":
-        # A player is waiting if they have picked but the packs haven't rotated.
-        if player.get("has_picked_this_round", False):
-             response["status"] = "waiting"
-        else:
-            response["pack"] = player["current_pack"]
-    response["deck"] = player["picked_cards"]
+@app.get("/api/v1/draft/{session_id}/status")
+def get_draft_status(session_id: str, player_id: str, with_cards: bool = True):
+    with draft_sessions.read(session_id) as session:
+        player = find_player(session, player_id)
+        return get_player_status(session, player, None if with_cards else set(player.picked_cards) | set(player.current_pack))
+
+@app.get("/api/v1/draft/{session_id}/events")
+async def get_draft_events(session_id: str, player_id: str):
+    """Server-Sent Events: the full status once, then deltas as players join, pick and packs rotate."""
+    # subscribed before reading the session, so no change falls between the status and the deltas
+    subscription = DRAFT_EVENTS.subscribe(session_id)
+    # each card's details go out once per stream, the client caches them
+    sent_cards = set()
+    try:
+        status, data = await asyncio.to_thread(read_player_status, session_id, player_id, sent_cards)
+    except BaseException:
+        subscription.close()
+        raise
+    return stream_events(subscription, {"type": "status", **status}, player_id, sent_cards, data)
 
-    return response
+def read_player_status(session_id: str, player_id: str, sent_cards: set) -> tuple[Dict[str, Any], CardData]:
+    with draft_sessions.read(session_id) as session:
+        status = get_player_status(session, find_player(session, player_id), sent_cards)
+        return status, card_data_for(session.data_version)
 
 
+CARD_NAME_PLACEHOLDER = '"[CARD_NAME]"'
+# everything, card images included, is revalidated with its ETag: update_db.py rewrites images in place
+STATIC_FILES = StaticFiles({})
 
+@lru_cache(maxsize=1)
+def card_page_template() -> tuple[str, str]:
+    """static/card.html split around the card name, read once."""
+    with open("static/card.html", "r") as f:
+        before, _, after = f.read().partition(CARD_NAME_PLACEHOLDER)
+    return before, after
 
 @app.get("/card/{safe_card_name}")
 async def get_card_page(safe_card_name: str) -> HTMLResponse:
     """Serve the card page for a specific card."""
-    with open("static/card.html", "r") as f:
-        html_content = f.read()
-    
-    html_content = html_content.replace("[CARD_NAME]", safe_card_name)
-
-    return HTMLResponse(content=html_content)
+    before, after = card_page_template()
+    # injected as a JS string literal, so the name cannot break out of the script
+    card_name = json.dumps(safe_card_name).replace("</", "<\\/")
+    return HTMLResponse(content=before + card_name + after, headers={"Cache-Control": "no-cache"})
 
 @app.get("/random")
-async def get_random_card_page() -> FileResponse:
-    return FileResponse("static/random.html")
+async def get_random_card_page(request: Request) -> Response:
+    return static_response("static/random.html", request)
 
 @app.get("/draft")
-async def get_draft_page() -> FileResponse:
-    return FileResponse("static/draft.html")
+async def get_draft_page(request: Request) -> Response:
+    return static_response("static/draft.html", request)
 
+def static_response(file_path: str, request: Request) -> Response:
+    response = STATIC_FILES.response(file_path, request.headers)
+    if response is None:
+        return JSONResponse(status_code=404, content={"message": "File not found"})
+    return response
 
 @app.get("/")
 @app.get("/{path:path}")
-async def get_static_file(path: str = "", q: str = ""):
+async def get_static_file(request: Request, path: str = "", q: str = ""):
     if not path:
         path = "index.html"
-    if path.endswith(".webp"):
-        file_path = os.path.join("images", path)
-    else:
-        file_path = os.path.join("static", path)
-    
-    if not os.path.exists(file_path):
+    root = "images" if path.endswith(".webp") else "static"
+    file_path = os.path.normpath(os.path.join(root, path))
+    if not file_path.startswith(root + os.sep):
         return JSONResponse(status_code=404, content={"message": "File not found"})
-    
-    mime_type = "application/octet-stream"
-    if "." in path:
-        ext = path.split(".")[-1].lower()
-        match ext:
-            case "html": mime_type = "text/html"
-            case "css": mime_type = "text/css"
-            case "js": mime_type = "application/javascript"
-            case "json": mime_type = "application/json"
-            case "webp": mime_type = "image/webp"
-    
-    print(f"Serving file: {file_path} with MIME type: {mime_type}")
-
-    return FileResponse(file_path, media_type=mime_type)
+    return static_response(file_path, request)
 
 if __name__ == "__main__":
-    port = 8000
-    if len(sys.argv) > 1:
-        port = int(sys.argv[1])
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    parser = argparse.ArgumentParser(description="Local Scryfall server")
+    parser.add_argument("port", nargs="?", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--draft-db", default="drafts.sqlite3", help="SQLite file that holds draft sessions when running several workers")
+    parser.add_argument("--query-threads", type=int, help="threads per worker for query evaluation and pack generation")
+    parser.add_argument("--query-queue", type=int, help="queued queries per worker before answering 503")
+    args = parser.parse_args()
+
+    if args.query_threads or args.query_queue:
+        # applied through the environment so spawned workers pick them up as well
+        if args.query_threads:
+            os.environ[QUERY_WORKERS_ENV] = str(args.query_threads)
+        if args.query_queue:
+            os.environ[QUERY_QUEUE_ENV] = str(args.query_queue)
+        QUERY_EXECUTOR = BoundedExecutor(int(os.environ.get(QUERY_WORKERS_ENV, 4)), int(os.environ.get(QUERY_QUEUE_ENV, 32)))
+
+    if args.workers > 1:
+        # Every worker memory-maps the same snapshot, so the card data is shared
+        # read-only between them instead of being parsed and held once per process.
+        if read_snapshot_version(snapshot_path(CARDS_PATH)) != CARD_DATA.version:
+            write_snapshot(CARD_DATA.store, snapshot_path(CARDS_PATH))
+        os.environ.setdefault(DRAFT_DB_ENV, args.draft_db)
+        # log_config=None leaves uvicorn's loggers (access log included) on our queue handler
+        uvicorn.run("server:app", host="0.0.0.0", port=args.port, workers=args.workers, log_config=None)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=args.port, log_config=None)
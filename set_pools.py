@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from card_store import CardStore
+
+
+class RarityPools:
+    """Row ids of one set's draftable cards, split the way the booster slots draw from them."""
+    __slots__ = ("commons", "uncommons", "rares", "mythics", "basic_lands",
+                 "commons_and_uncommons", "rares_and_mythics", "all_non_land")
+    # the pools finish() derives the others from, and that snapshots store
+    BASE_POOLS = ("commons", "uncommons", "rares", "mythics", "basic_lands")
+
+    def __init__(self):
+        self.commons: list[int] = []  # without lands
+        self.uncommons: list[int] = []
+        self.rares: list[int] = []
+        self.mythics: list[int] = []
+        self.basic_lands: list[int] = []
+        self.commons_and_uncommons: list[int] = []
+        self.rares_and_mythics: list[int] = []
+        self.all_non_land: list[int] = []
+
+    def is_draftable(self) -> bool:
+        """
+        Whether every draft booster of the set holds 15 different cards: 10 commons,
+        3 uncommons, a rare or mythic and a basic land, where a missing rare or
+        basic land is replaced by one more common. (Set boosters never exceed 12 cards.)
+        """
+        commons_needed = 10
+        if not self.rares:
+            commons_needed += 1
+        if not self.basic_lands:
+            commons_needed += 1
+        return len(self.commons) >= commons_needed and len(self.uncommons) >= 3
+
+    def finish(self) -> None:
+        self.commons_and_uncommons = self.commons + self.uncommons
+        self.rares_and_mythics = self.rares + self.mythics
+        self.all_non_land = self.commons + self.uncommons + self.rares + self.mythics
+
+
+class SetPools:
+    """
+    Per-set, per-rarity pools for booster generation, built in a single pass over
+    the store and saved with its snapshot. Tied to the store's data version.
+    """
+    SOURCE_KEYS = ("legal_formats", "rarity", "type_line", "set")  # the columns it is built from
+
+    def __init__(self, version: str, pools: dict[str, RarityPools]):
+        self.version = version
+        self.pools = pools
+        self.empty = RarityPools()
+
+    @classmethod
+    def from_store(cls, store: CardStore) -> "SetPools":
+        pools: dict[str, RarityPools] = defaultdict(RarityPools)
+        for row in range(len(store)):
+            if len(store.get(row, "legal_formats", [])) == 0:
+                continue
+            rarity = store.get(row, "rarity")
+            type_line = store.get(row, "type_line", "")
+            for set_code in set(store.get(row, "set", [])):
+                set_pools = pools[set_code]
+                if rarity == "common" and "Land" not in type_line:
+                    set_pools.commons.append(row)
+                elif rarity == "uncommon":
+                    set_pools.uncommons.append(row)
+                elif rarity == "rare":
+                    set_pools.rares.append(row)
+                elif rarity == "mythic":
+                    set_pools.mythics.append(row)
+                if type_line.startswith("Basic Land"):
+                    set_pools.basic_lands.append(row)
+        for set_pools in pools.values():
+            set_pools.finish()
+        return cls(store.version, dict(pools))
+
+    def get(self, set_code: str) -> RarityPools:
+        return self.pools.get(set_code, self.empty)
+
+    def draftable_sets(self) -> list[str]:
+        return sorted(set_code for set_code, pools in self.pools.items() if pools.is_draftable())
@@ -14,9 +14,11 @@ document.addEventListener('DOMContentLoaded', () => {
     let currentSessionId = null;
     let currentPlayerId = null;
     let isHost = false;
-    let sessionStateInterval = null;
-
-    const SessionPollingInterval = 750;
+    let sessionsSource = null;
+    let draftSource = null;
+    let deck = [];
+    // card details by card id; the server sends each card's details only once per stream
+    const cardCache = {};
 
     // Fetch sets for the dropdown
     fetch('/api/v1/sets?only_draftable=true')
@@ -51,25 +53,24 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
-    // Periodically refresh the list of sessions
-    setInterval(refreshSessions, SessionPollingInterval);
-    refreshSessions();
+    // The server pushes the list of open sessions whenever it changes
+    listenForSessions();
 
-    function refreshSessions() {
-        fetch('/api/v1/draft/sessions')
-            .then(response => response.json())
-            .then(data => {
-                sessionList.innerHTML = '';
-                data.sessions.forEach(session => {
-                    const li = document.createElement('li');
-                    li.innerHTML = `
-                        <span>${session.set_code.toUpperCase()} (${session.players.length}/8 players)</span>
-                        <button data-session-id="${session.id}">Join</button>
-                    `;
-                    li.querySelector('button').addEventListener('click', joinDraft);
-                    sessionList.appendChild(li);
-                });
+    function listenForSessions() {
+        sessionsSource = new EventSource('/api/v1/draft/sessions/events');
+        sessionsSource.addEventListener('lobbies', event => {
+            const data = JSON.parse(event.data);
+            sessionList.innerHTML = '';
+            data.sessions.forEach(session => {
+                const li = document.createElement('li');
+                li.innerHTML = `
+                    <span>${session.set_code.toUpperCase()} (${session.players.length}/8 players)</span>
+                    <button data-session-id="${session.id}">Join</button>
+                `;
+                li.querySelector('button').addEventListener('click', joinDraft);
+                sessionList.appendChild(li);
             });
+        });
     }
 
     function joinDraft(event) {
@@ -93,6 +94,10 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function showDraftRoom(session) {
+        if (sessionsSource) {
+            sessionsSource.close();
+            sessionsSource = null;
+        }
         lobby.style.display = 'none';
         draftRoom.style.display = 'block';
         draftRoomTitle.textContent = `Drafting: ${session.set_code.toUpperCase()}`;
@@ -100,7 +105,7 @@ document.addEventListener('DOMContentLoaded', () => {
         if (isHost) {
             startDraftBtn.style.display = 'block';
         }
-        pollForSessionState();
+        listenForSessionState();
     }
 
     function updatePlayerList(players) {
@@ -121,49 +126,82 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     startDraftBtn.addEventListener('click', () => {
-        // Just send the start request. The polling will handle UI updates.
+        // Just send the start request. The session events will handle UI updates.
         fetch(`/api/v1/draft/${currentSessionId}/start`, { method: 'POST' });
     });
 
-    function pollForSessionState() {
-        if (sessionStateInterval) {
-            clearInterval(sessionStateInterval);
+    function listenForSessionState() {
+        if (draftSource) {
+            draftSource.close();
         }
-        sessionStateInterval = setInterval(() => {
-            if (!currentSessionId || !currentPlayerId) {
-                clearInterval(sessionStateInterval);
-                return;
+        draftSource = new EventSource(`/api/v1/draft/${currentSessionId}/events?player_id=${currentPlayerId}`);
+
+        // Sent on every (re)connect with the full state; the other events are deltas.
+        draftSource.addEventListener('status', event => {
+            const state = JSON.parse(event.data);
+            Object.assign(cardCache, state.cards);
+            deck = state.deck || [];
+            updatePlayerList(state.players);
+
+            if (state.status === 'lobby') {
+                // Host can see the start button.
+                if (isHost) {
+                    startDraftBtn.style.display = 'block';
+                }
+            } else if (state.status === 'picking') {
+                startDraftBtn.style.display = 'none';
+                displayPack(toCards(state.pack));
+                displayPickedCards(toCards(deck));
+            } else if (state.status === 'waiting') {
+                startDraftBtn.style.display = 'none';
+                showWaiting();
+                displayPickedCards(toCards(deck));
+            } else if (state.status === 'finished') {
+                finishDraft();
             }
-            fetch(`/api/v1/draft/${currentSessionId}/status?player_id=${currentPlayerId}`)
-                .then(response => response.json())
-                .then(state => {
-                    updatePlayerList(state.players);
-
-                    if (state.status === 'lobby') {
-                        // Still in lobby, just keep updating player list.
-                        // Host can see the start button.
-                        if (isHost) {
-                            startDraftBtn.style.display = 'block';
-                        }
-                    } else if (state.status === 'picking') {
-                        startDraftBtn.style.display = 'none';
-                        displayPack(state.pack);
-                        displayPickedCards(state.deck);
-                    } else if (state.status === 'waiting') {
-                        startDraftBtn.style.display = 'none';
-                        packDisplay.innerHTML = '<p>Waiting for other players to pick...</p>';
-                        displayPickedCards(state.deck);
-                    } else if (state.status === 'finished') {
-                        clearInterval(sessionStateInterval);
-                        startDraftBtn.style.display = 'none';
-                        displayDecklist(state.deck);
-                    }
-                })
-                .catch(error => {
-                    console.error("Error polling for draft state:", error);
-                    clearInterval(sessionStateInterval);
-                });
-        }, SessionPollingInterval);
+        });
+        draftSource.addEventListener('players', event => {
+            updatePlayerList(JSON.parse(event.data).players);
+        });
+        draftSource.addEventListener('started', () => {
+            startDraftBtn.style.display = 'none';
+        });
+        draftSource.addEventListener('pack', event => {
+            const data = JSON.parse(event.data);
+            Object.assign(cardCache, data.cards);
+            displayPack(toCards(data.pack));
+        });
+        draftSource.addEventListener('picked', event => {
+            if (JSON.parse(event.data).player_id === currentPlayerId) {
+                showWaiting();
+            }
+        });
+        draftSource.addEventListener('finished', finishDraft);
+        draftSource.addEventListener('expired', () => {
+            draftSource.close();
+            draftSource = null;
+            packDisplay.innerHTML = '<p>This draft has expired.</p>';
+        });
+    }
+
+    function showWaiting() {
+        packDisplay.innerHTML = '<p>Waiting for other players to pick...</p>';
+    }
+
+    function finishDraft() {
+        if (draftSource) {
+            draftSource.close();
+            draftSource = null;
+        }
+        startDraftBtn.style.display = 'none';
+        // the last pick's response may still be in flight, so take the deck from the server
+        fetch(`/api/v1/draft/${currentSessionId}/status?player_id=${currentPlayerId}&with_cards=false`)
+            .then(response => response.json())
+            .then(state => displayDecklist(toCards(state.deck)));
+    }
+
+    function toCards(cardIds) {
+        return (cardIds || []).map(cardId => ({ id: cardId, ...cardCache[cardId] }));
     }
 
     function displayPack(pack) {
@@ -175,7 +213,7 @@ document.addEventListener('DOMContentLoaded', () => {
             cardImg.src = `/${card.file_name}`;
             cardImg.alt = card.name;
             cardImg.title = card.name;
-            cardImg.dataset.cardSafeName = card.safe_name;
+            cardImg.dataset.cardId = card.id;
             cardImg.addEventListener('click', pickCard);
             cardItem.appendChild(cardImg);
             packDisplay.appendChild(cardItem);
@@ -183,7 +221,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function pickCard(event) {
-        const cardSafeName = event.target.dataset.cardSafeName;
+        const cardId = parseInt(event.target.dataset.cardId);
         // Visually indicate the card has been picked
         document.querySelectorAll('#pack-display .card-item img').forEach(img => {
             img.parentElement.classList.add('picked');
@@ -194,7 +232,14 @@ document.addEventListener('DOMContentLoaded', () => {
         fetch(`/api/v1/draft/${currentSessionId}/pick`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ player_id: currentPlayerId, card_safe_name: cardSafeName })
+            body: JSON.stringify({ player_id: currentPlayerId, card_id: cardId })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.card !== undefined) {
+                deck.push(data.card);
+                displayPickedCards(toCards(deck));
+            }
         });
     }
 
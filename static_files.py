@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Tuple
+
+from fastapi.responses import FileResponse, Response
+
+
+# text assets at most this big are kept in memory, together with a gzipped copy
+MAX_MEMORY_ASSET_SIZE = 512 * 1024
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# pre-compressed files next to an asset (e.g. style.css.br), in order of preference
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("image/webp", ".webp")
+
+
+class Asset:
+    """What serving one file needs, worked out on the first request for it."""
+    __slots__ = ("path", "stat", "media_type", "etag", "last_modified", "body", "encoded")
+
+    def __init__(self, path: str, stat: os.stat_result):
+        self.path = path
+        self.stat = stat
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = '"' + hashlib.md5(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest() + '"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.body: Optional[bytes] = None
+        # content-encoding -> compressed bytes, or path and stat of a pre-compressed file
+        self.encoded: Dict[str, bytes | Tuple[str, os.stat_result]] = {}
+        for encoding, suffix in PRECOMPRESSED:
+            if os.path.isfile(path + suffix):
+                self.encoded[encoding] = (path + suffix, os.stat(path + suffix))
+        if stat.st_size <= MAX_MEMORY_ASSET_SIZE and self.media_type.startswith(COMPRESSIBLE_TYPES):
+            with open(path, "rb") as f:
+                self.body = f.read()
+            if "gzip" not in self.encoded:
+                self.encoded["gzip"] = gzip.compress(self.body, mtime=0)
+
+    def is_fresh(self, headers: Mapping[str, str]) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return any(tag.strip().removeprefix("W/") in (self.etag, "*") for tag in if_none_match.split(","))
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(self.stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+@lru_cache(maxsize=256)
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Content coding -> q-value of an Accept-Encoding header, "*" included. The result is shared, do not modify it."""
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """The (start, end) byte range, end exclusive, of a single-range header. Raises ValueError if unsatisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None  # serve the whole file
+    first, _, last = spec.strip().partition("-")
+    if not first:
+        if not last:
+            return None
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+    if start >= end:
+        raise ValueError(header)
+    return start, end
+
+
+class StaticFiles:
+    """
+    Serves files under a few directories with validators (ETag, Last-Modified, 304s),
+    Cache-Control, single byte ranges and gzip/brotli variants. Lookups of existing files
+    are cached, so a repeat request costs no filesystem calls; small text assets are served
+    from memory. Call clear() after files change on disk.
+    If-Range is only compared with the ETag: an HTTP-date there never matches, so such a
+    request gets the whole file, which is always a valid answer.
+    """
+
+    def __init__(self, cache_control: Mapping[str, str], default_cache_control: str = "no-cache", max_entries: int = 50000):
+        self.cache_control = cache_control  # media type prefix -> Cache-Control
+        self.default_cache_control = default_cache_control
+        self.max_entries = max_entries
+        self.assets: Dict[str, Asset] = {}
+
+    def clear(self) -> None:
+        self.assets.clear()
+
+    def lookup(self, file_path: str) -> Optional[Asset]:
+        try:
+            return self.assets[file_path]
+        except KeyError:
+            pass
+        try:
+            stat = os.stat(file_path)
+            asset = Asset(file_path, stat) if os.path.isfile(file_path) else None
+        except OSError:
+            asset = None
+        if asset is None:
+            # not remembered, so a file that appears later (e.g. a downloaded image) is found
+            return None
+        if len(self.assets) >= self.max_entries:
+            self.assets.clear()
+        self.assets[file_path] = asset
+        return asset
+
+    def response(self, file_path: str, request_headers: Mapping[str, str]) -> Optional[Response]:
+        """The response for the file, or None if there is no such file."""
+        asset = self.lookup(file_path)
+        if asset is None:
+            return None
+        headers = {
+            "ETag": asset.etag,
+            "Last-Modified": asset.last_modified,
+            "Cache-Control": self._cache_control(asset.media_type),
+            "Accept-Ranges": "bytes",
+        }
+        if asset.encoded:
+            headers["Vary"] = "Accept-Encoding"
+        if asset.is_fresh(request_headers):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request_headers.get("range")
+        if range_header and request_headers.get("if-range", asset.etag) == asset.etag:
+            try:
+                byte_range = _parse_range(range_header, asset.stat.st_size)
+            except ValueError:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{asset.stat.st_size}"})
+            if byte_range is not None:
+                return self._range_response(asset, byte_range, headers)
+
+        encoding = self._encoding(asset, request_headers.get("accept-encoding", ""))
+        if encoding is not None:
+            encoded = asset.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+            if isinstance(encoded, bytes):
+                return Response(encoded, media_type=asset.media_type, headers=headers)
+            return self._file_response(*encoded, asset.media_type, headers)
+        if asset.body is not None:
+            return Response(asset.body, media_type=asset.media_type, headers=headers)
+        return self._file_response(asset.path, asset.stat, asset.media_type, headers)
+
+    @staticmethod
+    def _encoding(asset: Asset, accept_encoding: str) -> Optional[str]:
+        """The variant with the highest q-value the client accepts; ties go to PRECOMPRESSED order."""
+        if not asset.encoded or not accept_encoding:
+            return None
+        accepted = _parse_accept_encoding(accept_encoding)
+        best, best_q = None, 0.0
+        for encoding in asset.encoded:
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def _cache_control(self, media_type: str) -> str:
+        for prefix, cache_control in self.cache_control.items():
+            if media_type.startswith(prefix):
+                return cache_control
+        return self.default_cache_control
+
+    @staticmethod
+    def _file_response(path: str, stat: os.stat_result, media_type: str, headers: Dict[str, str]) -> Response:
+        response = FileResponse(path, media_type=media_type, stat_result=stat)
+        # our validators replace the ones FileResponse derives from the stat
+        response.headers.update(headers)
+        return response
+
+    @staticmethod
+    def _range_response(asset: Asset, byte_range: Tuple[int, int], headers: Dict[str, str]) -> Response:
+        start, end = byte_range
+        if asset.body is not None:
+            body = asset.body[start:end]
+        else:
+            with open(asset.path, "rb") as f:
+                f.seek(start)
+                body = f.read(end - start)
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{asset.stat.st_size}"
+        return Response(body, status_code=206, media_type=asset.media_type, headers=headers)
@@ -0,0 +1,102 @@
+import importlib
+import json
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from draft_store import open_draft_store  # noqa: E402
+
+WORDS = "draw a card destroy target creature flying haste trample exile graveyard counter spell token".split()
+TYPES = ["Creature — Elf", "Legendary Creature — Dragon", "Instant", "Sorcery", "Basic Land — Forest", "Artifact"]
+RARITIES = ["common", "common", "common", "uncommon", "rare", "mythic"]
+
+
+def make_cards(count: int = 60, seed: int = 7) -> list[dict]:
+    """Small cards.json data set in the format prepare_data.py writes, with missing prices and stats."""
+    rng = random.Random(seed)
+    cards = []
+    for i in range(count):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}"
+        safe_name = name.lower().replace(" ", "-")
+        type_line = rng.choice(TYPES)
+        creature = "Creature" in type_line
+        year = rng.randint(1993, 2024)
+        cards.append({
+            "name": name,
+            "safe_name": safe_name,
+            "file_name": f"{safe_name}.webp",
+            "released-at": f"{year}-01-01",
+            "year": year,
+            "mana_cost": "{1}{G}",
+            "cmc": float(rng.randint(0, 7)),
+            "type_line": type_line,
+            "oracle_text": " ".join(rng.choices(WORDS, k=6)),
+            "power": str(rng.randint(0, 5)) if creature else "",
+            "toughness": str(rng.randint(0, 5)) if creature else "",
+            "loyalty": "",
+            "colors": rng.sample("WUBRG", rng.randint(0, 3)),
+            "color_identity": rng.sample("WUBRG", rng.randint(0, 3)),
+            "keywords": rng.sample(["Flying", "Haste", "Trample"], rng.randint(0, 2)),
+            "set": rng.sample(["abc", "def", "ghi"], rng.randint(1, 2)),
+            "rarity": rng.choice(RARITIES),
+            "edhrec_rank": rng.randint(1, 20000),
+            "price_euro": rng.choice([None, round(rng.random() * 10, 2)]),
+            "price_usd": rng.choice([None, round(rng.random() * 10, 2)]),
+            "legal_formats": rng.sample(["standard", "modern", "legacy"], rng.randint(0, 3)),
+        })
+    return cards
+
+
+@pytest.fixture(scope="session")
+def cards() -> list[dict]:
+    return make_cards()
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory, cards):
+    """The server module, imported in a directory holding the fixture cards.json."""
+    data_dir = tmp_path_factory.mktemp("data")
+    with open(data_dir / "cards.json", "w", encoding="utf-8") as f:
+        json.dump(cards, f)
+    os.symlink(os.path.join(ROOT, "static"), data_dir / "static")
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        yield importlib.import_module("server")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    from fastapi.testclient import TestClient
+    with TestClient(server.app, raise_server_exceptions=False) as client:
+        yield client
+
+
+class RecordingHub:
+    """Stands in for the server's DraftEventHub and keeps every published event."""
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, channel, event):
+        self.events.append((channel, event))
+
+    def last(self, event_type):
+        return next(event for _, event in reversed(self.events) if event["type"] == event_type)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def hub(request, server, monkeypatch, tmp_path):
+    """A fresh draft store of each kind, with its events recorded."""
+    store = open_draft_store(str(tmp_path / "drafts.sqlite3") if request.param == "sqlite" else "")
+    hub = RecordingHub()
+    monkeypatch.setattr(server, "draft_sessions", store)
+    monkeypatch.setattr(server, "DRAFT_EVENTS", hub)
+    return hub
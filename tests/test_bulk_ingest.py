@@ -0,0 +1,163 @@
+import io
+import json
+
+import pytest
+
+import bulk_ingest
+from bulk_ingest import ingest_bulk_file, iter_json_array, iter_json_elements
+
+
+VALID = [
+    "[]",
+    " \n[ ]\n",
+    '[1, 2.5, -3e2, 12345678, true, false, null]',
+    '["a]b", "q\\"]", "\\\\", "[", ""]',
+    '[{"a": [1, {"b": "]"}], "c": {}}, [[], [{}]], "x"]\n',
+    '[\n  {"name": "Elf", "cmc": 1.5},\n  {"name": "Draw, \\"Token\\"", "set": ["abc"]}\n]\n',
+]
+
+MALFORMED = [
+    "",
+    "   ",
+    "{}",
+    "[1 2]",
+    "[1,,2]",
+    "[,1]",
+    "[1,]",
+    "[1]x",
+    "[1] [2]",
+    '["a" "b"]',
+    "[{} {}]",
+    "[1, 2",
+    "[1, 2,",
+    "[1, abc]",
+]
+
+
+def read_all(text, chunk_size):
+    return list(iter_json_array(io.StringIO(text), chunk_size))
+
+
+@pytest.mark.parametrize("text", VALID)
+def test_iter_json_array_across_chunk_boundaries(text):
+    expected = json.loads(text)
+    for chunk_size in range(1, len(text) + 2):
+        assert read_all(text, chunk_size) == expected, chunk_size
+
+
+@pytest.mark.parametrize("text", MALFORMED)
+def test_iter_json_array_rejects_malformed_input(text):
+    for chunk_size in range(1, len(text) + 2):
+        with pytest.raises(ValueError):
+            read_all(text, chunk_size)
+
+
+@pytest.mark.parametrize("pieces", [
+    ["[]"],
+    ['[{"a": 1}, {"b": "]"}]'],
+    ["[", '\n  {"a": 1},', '\n  {"b": [2, 3]},', "\n  {}\n]\n"],
+    ['[\n  {"a": 1},\n  {"b": 2},', '\n  {"c": "},\\n  {"}\n]'],
+])
+def test_iter_json_elements_pieces(pieces):
+    assert [value for piece in pieces for value in iter_json_elements(piece)] == json.loads("".join(pieces))
+
+
+@pytest.mark.parametrize("piece", [
+    '{"a": 1} {"b": 2},',
+    '{"a": 1},,',
+    '{"a": 1},\n,{"b": 2},',
+    '{"a": 1}',
+    '[{"a": 1},]',
+    '{"a": 1}]x',
+    '[{"a": 1}]\n[]',
+])
+def test_iter_json_elements_rejects_malformed_pieces(piece):
+    with pytest.raises(ValueError):
+        list(iter_json_elements(piece))
+
+
+def bulk_card(i):
+    """A Scryfall card object; every third one is a reprint of an earlier card in another set."""
+    name = f"Card {i // 3 if i % 3 == 2 else i}"
+    card = {
+        "object": "card",
+        "name": name,
+        "lang": "en" if i % 7 else "de",
+        "released_at": f"{2000 + i % 20}-01-01",
+        "set": f"s{i % 5}",
+        "rarity": ["common", "uncommon", "rare"][i % 3],
+        "cmc": float(i % 6),
+        "prices": {"usd": f"{i % 9}.25" if i % 4 else None, "eur": None},
+        "legalities": {"modern": "legal", "standard": "legal" if i % 2 else "not_legal"},
+        "edhrec_rank": i,
+    }
+    if i % 5 == 0:
+        card["card_faces"] = [
+            {"name": "Front", "type_line": "Creature — Elf", "oracle_text": "Flying, \"haste\" ]",
+             "image_uris": {"normal": f"https://img/{i}-front.jpg"}},
+            {"name": "Back", "type_line": "Instant", "image_uris": {"normal": f"https://img/{i}-back.jpg"}},
+        ]
+    else:
+        card.update(type_line="Sorcery", oracle_text="Draw a card.", image_uris={"normal": f"https://img/{i}.jpg"})
+    return card
+
+
+BULK_CARDS = [bulk_card(i) for i in range(60)]
+
+
+def scryfall_format(cards):
+    # how Scryfall writes its bulk files: one card per line
+    return "[\n" + ",\n".join(json.dumps(card) for card in cards) + "\n]\n"
+
+
+def miscut_format(cards):
+    # a nested object at the indentation of the top-level ones, so cutting before it splits a card
+    text = scryfall_format(cards)
+    return text.replace('"card_faces": [{', '"card_faces": [\n{')
+
+
+@pytest.fixture
+def small_pieces(monkeypatch):
+    monkeypatch.setattr(bulk_ingest, "PARALLEL_CHUNK_BYTES", 512)
+
+
+@pytest.mark.parametrize("layout, delimited", [
+    (scryfall_format, True),
+    (lambda cards: json.dumps(cards, indent=4), True),
+    (json.dumps, False),
+    (lambda cards: json.dumps(cards, separators=(",", ":")), False),
+    (miscut_format, True),
+])
+def test_parallel_ingest_matches_one_pass(tmp_path, small_pieces, caplog, layout, delimited):
+    path = tmp_path / "bulk.json"
+    path.write_text(layout(BULK_CARDS), encoding="utf-8")
+    delimiter = bulk_ingest.element_delimiter(str(path))
+    assert (delimiter is not None) == delimited
+    if delimited:
+        assert len(list(bulk_ingest.iter_bulk_chunks(str(path), delimiter, 512))) > 2
+
+    expected = ingest_bulk_file(str(path), workers=1)
+    assert ingest_bulk_file(str(path), workers=3) == expected
+    cards, image_jobs = expected
+    assert len(cards) == len({card["name"] for card in BULK_CARDS})
+    assert next(card for card in cards if card["name"] == "Card 0")["set"] == ["s0", "s2"]
+    assert image_jobs["card-10-creature-elf.webp"] == "https://img/10-front.jpg"
+    # only the miscut file falls back to reading in one pass
+    assert ("reading it in one pass" in caplog.text) == (layout is miscut_format)
+
+
+def test_iter_bulk_chunks_cuts_before_elements(tmp_path):
+    path = tmp_path / "bulk.json"
+    path.write_text(scryfall_format(BULK_CARDS), encoding="utf-8")
+    pieces = list(bulk_ingest.iter_bulk_chunks(str(path), b"\n{", 300))
+    assert b"".join(pieces) == path.read_bytes()
+    assert all(piece.startswith(b"\n{") for piece in pieces[1:])
+    assert [card for piece in pieces for card in iter_json_elements(piece.decode())] == BULK_CARDS
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_ingest_rejects_truncated_file(tmp_path, small_pieces, workers):
+    path = tmp_path / "bulk.json"
+    path.write_text(scryfall_format(BULK_CARDS).rstrip().rstrip("]"), encoding="utf-8")
+    with pytest.raises(ValueError):
+        ingest_bulk_file(str(path), workers=workers)
@@ -0,0 +1,51 @@
+import pytest
+
+from card_data import CardData
+from card_snapshot import load_snapshot, write_snapshot
+from scryfall_bulk_importer import build_store
+from set_pools import RarityPools
+
+
+def name_index_state(index):
+    return (index.by_safe_name, index.names.keys, list(index.names.rows), index.words.keys, list(index.words.rows))
+
+
+def set_pools_state(set_pools):
+    return {set_code: {name: list(getattr(pools, name)) for name in RarityPools.__slots__}
+            for set_code, pools in set_pools.pools.items()}
+
+
+@pytest.fixture
+def built(cards):
+    return build_store(cards, "test")
+
+
+def test_derived_lookups_round_trip(built, tmp_path):
+    path = str(tmp_path / "cards.snapshot")
+    write_snapshot(built, path)
+    loaded = load_snapshot(path)
+    # a loaded store is written back when only the metadata changes
+    write_snapshot(loaded, path)
+    loaded = load_snapshot(path)
+
+    for store in (built, loaded):
+        assert store.derived["names"].version == store.derived["set_pools"].version == "test"
+    assert name_index_state(loaded.derived["names"]) == name_index_state(built.derived["names"])
+    assert set_pools_state(loaded.derived["set_pools"]) == set_pools_state(built.derived["set_pools"])
+
+    data = CardData(loaded)
+    assert data.name_index is loaded.derived["names"]
+    assert data.set_pools is loaded.derived["set_pools"]
+    assert data.name_index.complete("dra") == built.derived["names"].complete("dra")
+
+
+def test_snapshot_without_derived_lookups(built, tmp_path):
+    expected_names = name_index_state(built.derived["names"])
+    expected_pools = set_pools_state(built.derived["set_pools"])
+    built.derived.clear()
+    path = str(tmp_path / "cards.snapshot")
+    write_snapshot(built, path)
+
+    data = CardData(load_snapshot(path))
+    assert name_index_state(data.name_index) == expected_names
+    assert set_pools_state(data.set_pools) == expected_pools
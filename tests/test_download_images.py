@@ -0,0 +1,128 @@
+import io
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import download_images
+
+
+def png_bytes() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class ImageServer:
+    """
+    Serves a small PNG for every path, except: /missing* answers 404, /throttled* 429
+    twice, /flaky* 500 twice and /down* always 503. hits counts requests by path.
+    """
+
+    def __init__(self):
+        self.hits = Counter()
+        png = png_bytes()
+        hits = self.hits
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                hits[self.path] += 1
+                if self.path.startswith("/missing"):
+                    self.send_error(404)
+                elif self.path.startswith("/throttled") and hits[self.path] <= 2:
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                elif self.path.startswith("/flaky") and hits[self.path] <= 2 or self.path.startswith("/down"):
+                    self.send_error(500 if self.path.startswith("/flaky") else 503)
+                else:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/png")
+                    self.send_header("Content-Length", str(len(png)))
+                    self.end_headers()
+                    self.wfile.write(png)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def image_server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(download_images, "BACKOFF_SECONDS", 0.01)
+    server = ImageServer()
+    yield server
+    server.close()
+
+
+def read_sources():
+    with open(download_images.IMAGE_SOURCES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_retries_throttled_and_server_errors(image_server):
+    jobs = {"throttled.webp": image_server.url("/throttled"), "flaky.webp": image_server.url("/flaky")}
+    assert download_images.download_image_jobs(jobs) == 0
+    assert image_server.hits["/throttled"] == 3
+    assert image_server.hits["/flaky"] == 3
+    with Image.open("images/flaky.webp") as img:
+        assert img.format == "WEBP"
+    assert read_sources() == jobs
+
+
+def test_gives_up_after_max_attempts(image_server):
+    assert download_images.download_image_jobs({"down.webp": image_server.url("/down")}) == 1
+    assert image_server.hits["/down"] == download_images.MAX_ATTEMPTS
+
+
+def test_missing_image_fails_without_retrying(image_server):
+    jobs = {"ok.webp": image_server.url("/ok"), "missing.webp": image_server.url("/missing")}
+    assert download_images.download_image_jobs(jobs) == 1
+    assert image_server.hits["/missing"] == 1
+    assert read_sources() == {"ok.webp": jobs["ok.webp"]}
+
+
+def test_resumes_from_sources(image_server):
+    jobs = {f"ok{i}.webp": image_server.url(f"/ok{i}") for i in range(5)}
+    jobs["missing.webp"] = image_server.url("/missing")
+    assert download_images.download_image_jobs(jobs) == 1
+
+    image_server.hits.clear()
+    assert download_images.download_image_jobs(jobs) == 1
+    # only the image that is still missing is requested again
+    assert image_server.hits == Counter({"/missing": 1})
+
+
+def test_refetches_changed_url(image_server):
+    jobs = {"a.webp": image_server.url("/a?v=1"), "b.webp": image_server.url("/b?v=1")}
+    assert download_images.download_image_jobs(jobs) == 0
+
+    image_server.hits.clear()
+    jobs["a.webp"] = image_server.url("/a?v=2")
+    assert download_images.download_image_jobs(jobs) == 0
+    assert image_server.hits == Counter({"/a?v=2": 1})
+    assert read_sources()["a.webp"] == jobs["a.webp"]
+
+
+def test_existing_images_are_taken_as_current(image_server, tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "old.webp").write_bytes(b"")
+    jobs = {"old.webp": image_server.url("/old")}
+    assert download_images.download_image_jobs(jobs) == 0
+    assert image_server.hits == Counter()
+    assert read_sources() == jobs
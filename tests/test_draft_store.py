@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+
+import draft_store
+from draft_events import DraftEventHub
+from draft_session import IDLE_TTL_SECONDS, DraftSession
+from draft_store import DraftStoreFull, open_draft_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return open_draft_store(str(tmp_path / "drafts.sqlite3") if request.param == "sqlite" else "")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() frozen at now[0], which tests move forward."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def create(store, session_id, status="lobby"):
+    session = DraftSession(session_id, "abc", num_packs=1)
+    session.add_player("p1", "host", is_host=True)
+    store.create(session)
+    if status != "lobby":
+        with store.edit(session_id) as session:
+            session.start([[[1, 2]]])
+            if status == "finished":
+                session.pick(session.players[0], 1)
+                session.pick(session.players[0], 2)
+    return session
+
+
+def test_sessions_expire_by_status(store, clock):
+    for status in ("lobby", "picking", "finished"):
+        assert create(store, status, status).status == status
+    assert store.sweep() == []
+
+    for status, ttl in sorted(IDLE_TTL_SECONDS.items(), key=lambda item: item[1]):
+        clock[0] = 1_000_000.0 + ttl - 1
+        assert store.get(status) is not None
+        clock[0] = 1_000_000.0 + ttl + 1
+        assert store.sweep() == [status]
+        assert store.get(status) is None
+
+
+def test_activity_extends_the_ttl(store, clock):
+    create(store, "a")
+    clock[0] += IDLE_TTL_SECONDS["lobby"] - 1
+    with store.edit("a") as session:
+        session.add_player("p2", "guest")
+    clock[0] += IDLE_TTL_SECONDS["lobby"] - 1
+    assert store.sweep() == []
+    assert len(store.get("a").players) == 2
+
+
+def test_sweep_drops_expired_lobbies(store, clock):
+    create(store, "old")
+    clock[0] += IDLE_TTL_SECONDS["lobby"] / 2
+    create(store, "new")
+    clock[0] += IDLE_TTL_SECONDS["lobby"] / 2 + 1
+    assert store.sweep() == ["old"]
+    assert [session.id for session in store.lobbies()] == ["new"]
+    assert store.data_versions() == {""}
+
+
+def test_create_sweeps_when_full(store, clock, monkeypatch):
+    monkeypatch.setattr(draft_store, "MAX_SESSIONS", 2)
+    create(store, "a")
+    create(store, "b", "picking")
+    with pytest.raises(DraftStoreFull, match="at most 2"):
+        create(store, "c")
+    assert store.get("c") is None
+
+    # only the lobby has expired, which makes room
+    clock[0] += IDLE_TTL_SECONDS["lobby"] + 1
+    create(store, "c")
+    assert store.get("a") is None and store.get("b") is not None
+    with pytest.raises(DraftStoreFull):
+        create(store, "d")
+
+
+def published(hub, loop, queue):
+    if hub.store.shared:
+        return [event["type"] for _, _, event in hub.store.events_since(0)]
+    loop.run_until_complete(asyncio.sleep(0))
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait()["type"])
+    return events
+
+
+def test_events_of_a_failed_edit_are_not_published(store):
+    loop = asyncio.new_event_loop()
+    try:
+        hub = DraftEventHub(store)
+        hub.loop = loop
+        queue = asyncio.Queue()
+        hub.subscribers["a"].add(queue)
+        create(store, "a")
+
+        with pytest.raises(RuntimeError):
+            with store.edit("a") as session:
+                hub.publish("a", {"type": "players"})
+                raise RuntimeError
+        assert published(hub, loop, queue) == []
+
+        with store.edit("a") as session:
+            session.add_player("p2", "guest")
+            hub.publish("a", {"type": "players"})
+            if not store.shared:
+                assert published(hub, loop, queue) == []
+        hub.publish("a", {"type": "started"})
+        assert published(hub, loop, queue)[-2:] == ["players", "started"]
+    finally:
+        loop.close()
@@ -0,0 +1,55 @@
+import time
+
+import draft_store
+from draft_session import IDLE_TTL_SECONDS
+
+
+def test_lobby_events_follow_join_and_start(client, hub):
+    created = client.post("/api/v1/draft/new", json={"set_code": "abc", "player_name": "host"}).json()
+    session_id = created["session_id"]
+    assert [s["id"] for s in hub.last("lobbies")["sessions"]] == [session_id]
+
+    assert client.post(f"/api/v1/draft/{session_id}/join", json={"player_name": "guest"}).status_code == 200
+    assert len(hub.last("players")["players"]) == 2
+    lobby = hub.last("lobbies")["sessions"][0]
+    assert len(lobby["players"]) == 2
+    assert lobby == client.get("/api/v1/draft/sessions").json()["sessions"][0]
+
+    assert client.post(f"/api/v1/draft/{session_id}/start").status_code == 200
+    assert hub.last("lobbies")["sessions"] == []
+    assert client.get("/api/v1/draft/sessions").json()["sessions"] == []
+
+
+def test_pick_and_status(client, hub):
+    created = client.post("/api/v1/draft/new", json={"set_code": "abc", "player_name": "host", "num_packs": 1}).json()
+    session_id, player_id = created["session_id"], created["player_id"]
+    assert client.post(f"/api/v1/draft/{session_id}/start").status_code == 200
+
+    status = client.get(f"/api/v1/draft/{session_id}/status", params={"player_id": player_id}).json()
+    card_id = status["pack"][0]
+    assert client.post(f"/api/v1/draft/{session_id}/pick", json={"player_id": player_id, "card_id": card_id}).status_code == 200
+    status = client.get(f"/api/v1/draft/{session_id}/status", params={"player_id": player_id}).json()
+    assert status["deck"] == [card_id]
+    assert ("picked", player_id) in [(event["type"], event.get("player_id")) for _, event in hub.events]
+
+
+def test_expired_drafts_are_announced(client, server, hub, monkeypatch):
+    lobby = client.post("/api/v1/draft/new", json={"set_code": "abc", "player_name": "host"}).json()["session_id"]
+    started = client.post("/api/v1/draft/new", json={"set_code": "abc", "player_name": "host"}).json()["session_id"]
+    assert client.post(f"/api/v1/draft/{started}/start").status_code == 200
+
+    now = time.time() + IDLE_TTL_SECONDS["lobby"] + 1
+    monkeypatch.setattr(time, "time", lambda: now)
+    server.publish_expired(server.draft_sessions.sweep())
+    assert (lobby, {"type": "expired"}) in hub.events
+    assert (started, {"type": "expired"}) not in hub.events
+    assert hub.last("lobbies")["sessions"] == []
+    assert client.post(f"/api/v1/draft/{lobby}/join", json={"player_name": "guest"}).status_code == 404
+
+
+def test_new_draft_when_full(client, hub, monkeypatch):
+    monkeypatch.setattr(draft_store, "MAX_SESSIONS", 1)
+    assert client.post("/api/v1/draft/new", json={"set_code": "abc", "player_name": "host"}).status_code == 200
+    response = client.post("/api/v1/draft/new", json={"set_code": "abc", "player_name": "host"})
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Too many active drafts (at most 1)"
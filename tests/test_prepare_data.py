@@ -0,0 +1,96 @@
+import copy
+
+import pytest
+
+import prepare_data
+import scryfall_bulk_importer
+from card_snapshot import load_snapshot
+from prepare_data import changed_card_keys, merge_card_changes
+from scryfall_bulk_importer import build_store, snapshot_path
+
+
+def card(name, /, **values):
+    return {"name": name, "safe_name": name.lower(), "price_usd": 1.0, **values}
+
+
+def names(cards):
+    return [c["safe_name"] for c in cards]
+
+
+def test_merge_keeps_the_old_order():
+    old = [card("A"), card("B"), card("C")]
+    new = [card("C"), card("A"), card("B")]
+    cards, changes = merge_card_changes(old, new)
+    assert names(cards) == ["a", "b", "c"]
+    assert changes == 0
+
+
+def test_merge_counts_changed_cards():
+    old = [card("A"), card("B"), card("C")]
+    new = [card("B", price_usd=2.0), card("A"), card("C", price_usd=None)]
+    cards, changes = merge_card_changes(old, new)
+    assert names(cards) == ["a", "b", "c"]
+    assert cards[1]["price_usd"] == 2.0 and cards[2]["price_usd"] is None
+    assert changes == 2
+
+
+def test_merge_appends_added_and_drops_removed_cards():
+    old = [card("A"), card("B"), card("C")]
+    new = [card("D"), card("C"), card("A"), card("E")]
+    cards, changes = merge_card_changes(old, new)
+    assert names(cards) == ["a", "c", "d", "e"]
+    assert changes == 3
+
+
+def test_merge_into_nothing():
+    cards, changes = merge_card_changes([], [card("A")])
+    assert names(cards) == ["a"] and changes == 1
+
+
+@pytest.mark.parametrize("new, expected", [
+    ([card("A"), card("B")], set()),
+    ([card("A", price_usd=3.0), card("B", name="Bee")], {"price_usd", "name"}),
+    ([card("A"), card("C")], None),  # one removed, one added
+    ([card("A")], None),
+    ([card("A", rarity="rare"), card("B")], None),  # a new key
+])
+def test_changed_card_keys(new, expected):
+    assert changed_card_keys([card("A"), card("B")], new) == expected
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def store_state(store):
+    return [store.card(row) for row in range(store.size)], sorted(store.indexes), sorted(store.derived)
+
+
+@pytest.mark.parametrize("change", ["prices", "rarity", "names"])
+def test_patched_snapshot_matches_full_build(data_dir, cards, change, monkeypatch):
+    prepare_data.write_card_data(cards, "day 1")
+    new_cards = copy.deepcopy(cards)
+    for c in new_cards:
+        if change == "prices":
+            c["price_usd"] = None if c["price_usd"] is None else c["price_usd"] + 1
+        elif change == "rarity":
+            c["rarity"] = "rare"
+        else:
+            c["name"] = c["name"].upper()
+    keys = changed_card_keys(cards, new_cards)
+    with monkeypatch.context() as patch:
+        patch.setattr(scryfall_bulk_importer, "build_store", None)  # only the changed columns are built
+        prepare_data.write_card_data(new_cards, "day 2", keys)
+
+    patched = load_snapshot(snapshot_path(prepare_data.CARDS_PATH))
+    full = build_store(new_cards, patched.version)
+    assert store_state(patched) == store_state(full)
+    assert patched.metadata["bulk_updated_at"] == "day 2"
+    for key in ("price_usd", "name", "cmc"):
+        assert type(patched.indexes[key]) is type(full.indexes[key])
+    assert patched.indexes["price_usd"].select(">", 3.0) == full.indexes["price_usd"].select(">", 3.0)
+    assert patched.derived["names"].complete("dra") == full.derived["names"].complete("dra")
+    assert patched.derived["set_pools"].draftable_sets() == full.derived["set_pools"].draftable_sets()
+    assert patched.derived["names"].version == patched.derived["set_pools"].version == patched.version
@@ -0,0 +1,110 @@
+import pytest
+
+from query_cache import QueryCache, canonical_key
+from query_compiler import compile_filter
+from scryfall_bulk_importer import build_store
+from scryfall_syntax_parser import Filter, LogicalFilter, LogicalOperator, Operator, query_to_filter
+
+
+@pytest.fixture(scope="module")
+def store(cards):
+    return build_store(cards, "v1")
+
+
+def key(query):
+    return canonical_key(query_to_filter(query) if isinstance(query, str) else query)
+
+
+def rows(store, query):
+    return list(compile_filter(query_to_filter(query)).rows(store))
+
+
+ELF = Filter("type_line", "elf", Operator.CONTAINS)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("t:creature r:common", "r:common t:creature"),
+    ("t:creature OR t:instant", "t:instant OR t:creature"),
+    ("t:creature OR t:instant OR r:rare", "r:rare OR t:instant OR t:creature"),
+    ("t:creature r:common cmc>2", "cmc>2 t:creature r:common t:creature"),
+    ("t:Creature", "type:creature"),
+    ("o:'Draw A Card'", "text:'draw a card'"),
+    ("c:gw", "color:WG"),
+    (LogicalFilter(LogicalOperator.NOT, [LogicalFilter(LogicalOperator.NOT, [ELF])]), ELF),
+    (LogicalFilter(LogicalOperator.AND, [LogicalFilter(LogicalOperator.AND, [ELF, Filter("cmc", 2.0, Operator.LESS_THAN)]),
+                                         Filter("rarity", "rare")]),
+     LogicalFilter(LogicalOperator.AND, [Filter("rarity", "rare"), Filter("cmc", 2.0, Operator.LESS_THAN), ELF])),
+])
+def test_equivalent_queries_share_a_key(first, second):
+    assert key(first) == key(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("name='Elf'", "name='elf'"),
+    ("r=Common", "r=common"),
+    ("t:elf", "-t:elf"),
+    ("t:elf OR r:rare", "t:elf r:rare"),
+    ("cmc>3", "cmc>=3"),
+    ("c>g", "c>gg"),
+    # pow>abc fails on the rows it reaches, and check() only reaches it if cmc>100 matches
+    ("cmc>100 pow>abc", "pow>abc cmc>100"),
+])
+def test_different_queries_do_not_share_a_key(first, second):
+    assert key(first) != key(second)
+
+
+def test_failing_trees_keep_their_order(store):
+    cache = QueryCache()
+    assert list(cache.rows(store, query_to_filter("cmc>100 pow>abc"))) == []
+    with pytest.raises(ValueError):
+        cache.rows(store, query_to_filter("pow>abc cmc>100"))
+
+
+def test_hits_and_misses(store):
+    cache = QueryCache()
+    first = cache.rows(store, query_to_filter("t:creature r:common"))
+    assert list(first) == rows(store, "t:creature r:common")
+    assert cache.rows(store, query_to_filter("r:common t:Creature")) is first
+    cache.rows(store, query_to_filter("t:instant"))
+    assert cache.stats() == {"entries": 2, "bytes": 4 * (len(first) + len(rows(store, "t:instant"))),
+                             "hits": 1, "misses": 2, "evictions": 0, "version": "v1"}
+
+
+def test_evicts_least_recently_used_entry(store):
+    cache = QueryCache(max_entries=2)
+    cache.rows(store, query_to_filter("t:creature"))
+    cache.rows(store, query_to_filter("t:instant"))
+    cache.rows(store, query_to_filter("t:creature"))
+    cache.rows(store, query_to_filter("t:sorcery"))
+    assert list(cache.entries) == [key("t:creature"), key("t:sorcery")]
+    assert cache.stats()["evictions"] == 1
+
+    cache.rows(store, query_to_filter("t:instant"))
+    assert cache.stats()["misses"] == 4
+
+
+def test_bounded_by_bytes(store):
+    creatures, instants = rows(store, "t:creature"), rows(store, "t:instant")
+    assert creatures and instants
+    cache = QueryCache(max_bytes=4 * (len(creatures) + len(instants)) - 1)
+    cache.rows(store, query_to_filter("t:creature"))
+    cache.rows(store, query_to_filter("t:instant"))
+    assert list(cache.entries) == [key("t:instant")]
+    assert cache.size_bytes == 4 * len(instants)
+
+    # a result larger than the whole bound is returned but not kept
+    cache = QueryCache(max_bytes=4 * len(creatures) - 1)
+    assert list(cache.rows(store, query_to_filter("t:creature"))) == creatures
+    assert not cache.entries and cache.size_bytes == 0
+
+
+def test_new_data_version_empties_the_cache(store, cards):
+    cache = QueryCache()
+    cache.rows(store, query_to_filter("t:creature"))
+    cache.rows(store, query_to_filter("t:instant"))
+
+    reloaded = build_store(cards[::-1], "v2")
+    assert list(cache.rows(reloaded, query_to_filter("t:creature"))) == rows(reloaded, "t:creature")
+    assert cache.stats()["version"] == "v2"
+    assert list(cache.entries) == [key("t:creature")]
+    assert cache.stats()["misses"] == 3
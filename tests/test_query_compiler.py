@@ -0,0 +1,145 @@
+import copy
+
+import pytest
+
+from card_snapshot import load_snapshot, write_snapshot
+from query_compiler import compile_filter
+from scryfall_bulk_importer import build_store
+from scryfall_syntax_parser import (OPERATOR_SYMBOLS, Filter, LogicalFilter, LogicalOperator, Operator,
+                                    apply_filters, query_to_filter)
+
+
+# key -> values each operator symbol is tried with
+OPERANDS = {
+    "cmc": ["0", "3", "2.5"],
+    "usd": ["1", "4.5"],
+    "eur": ["0", "9"],
+    "edhrec_rank": ["10000"],
+    "name": ["elf", "'Draw Token 3'"],
+    "t": ["creature", "Instant"],
+    "o": ["draw", '"target creature"'],
+    "r": ["common", "mythic"],
+    "pow": ["3", "abc"],
+    "kw": ["flying"],
+    "s": ["abc"],
+    "f": ["modern"],
+    "c": ["g", "wu", "c", "wubrg"],
+    "ci": ["r", "bg", "c"],
+    "release": ["2001"],
+    "unknown_key": ["x"],
+}
+
+QUERIES = [
+    f"{key}{symbol}{value}" for key, values in OPERANDS.items() for value in values for symbol in OPERATOR_SYMBOLS
+] + [
+    "t:creature OR t:instant",
+    "t:creature OR t:instant r:common",
+    "-c:g OR t:elf",
+    "-r:common -t:creature",
+    "cmc>=2 and usd<5 or eur>3",
+    "c>=g -ci<=wubrg",
+    "cmc>100 pow>abc",
+    "cmc<100 pow>abc",
+    "elf",
+    "usd>=0 OR usd:1",
+    "-usd>=0 usd:1",
+    "eur<100 OR eur:1 OR t:elf",
+]
+
+
+def nested_filters():
+    creature = Filter("type_line", "creature", Operator.CONTAINS)
+    green = Filter("colors", "g", Operator.CONTAINS)
+    cheap = Filter("price_usd", 2.0, Operator.LESS_THAN)
+    return [
+        LogicalFilter(LogicalOperator.NOT, [LogicalFilter(LogicalOperator.OR, [
+            LogicalFilter(LogicalOperator.AND, [creature, green]),
+            LogicalFilter(LogicalOperator.NOT, [cheap]),
+        ])]),
+        LogicalFilter(LogicalOperator.NOT, [LogicalFilter(LogicalOperator.NOT, [green])]),
+        LogicalFilter(LogicalOperator.AND, [LogicalFilter(LogicalOperator.AND, [creature, cheap]), green]),
+        LogicalFilter(LogicalOperator.OR, [LogicalFilter(LogicalOperator.OR, [creature]), cheap]),
+        LogicalFilter(LogicalOperator.AND, []),
+        LogicalFilter(LogicalOperator.OR, []),
+        # invalid trees: errors only where check() would reach them
+        LogicalFilter(LogicalOperator.NOT, [creature, green]),
+        LogicalFilter(LogicalOperator.AND, [Filter("cmc", 100.0, Operator.GREATER_THAN),
+                                            LogicalFilter(LogicalOperator.NOT, [creature, green])]),
+        LogicalFilter(LogicalOperator.OR, [creature, Filter("rarity", "common", Operator.GREATER_THAN)]),
+        LogicalFilter(LogicalOperator.AND, [Filter("keywords", "flying", Operator.LESS_THAN)]),
+    ]
+
+
+@pytest.fixture(scope="module")
+def fixture_cards(cards):
+    cards = copy.deepcopy(cards)
+    # missing prices are stored as NaN, and must still behave like None in check()
+    for card in cards[:3]:
+        card["price_usd"] = None
+    cards[3]["price_euro"] = None
+    # whole cmcs written as ints next to floats, and ranks missing for a few cards
+    for card in cards[::2]:
+        card["cmc"] = int(card["cmc"])
+    cards[5]["cmc"] = 2.5
+    for card in cards[4:7]:
+        card["edhrec_rank"] = None
+    return cards
+
+
+@pytest.fixture(scope="module", params=["build_store", "load_snapshot"])
+def store(request, fixture_cards, tmp_path_factory):
+    store = build_store(fixture_cards, "test")
+    if request.param == "build_store":
+        return store
+    path = tmp_path_factory.mktemp("snapshot") / "cards.snapshot"
+    write_snapshot(store, str(path))
+    return load_snapshot(str(path))
+
+
+def checked_names(cards, filter):
+    try:
+        return [card["safe_name"] for card in cards if filter.check(card)]
+    except ValueError:
+        return ValueError
+
+
+def compiled_names(store, filter):
+    try:
+        return [store.get(row, "safe_name") for row in compile_filter(filter).rows(store)]
+    except ValueError:
+        return ValueError
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_query_matches_check(store, fixture_cards, query):
+    filter = query_to_filter(query)
+    assert compiled_names(store, filter) == checked_names(fixture_cards, filter)
+
+
+@pytest.mark.parametrize("index", range(len(nested_filters())))
+def test_nested_filter_matches_check(store, fixture_cards, index):
+    filter = nested_filters()[index]
+    assert compiled_names(store, filter) == checked_names(fixture_cards, filter)
+
+
+def test_fixture_exercises_matches_and_errors(store, fixture_cards):
+    results = [checked_names(fixture_cards, query_to_filter(query)) for query in QUERIES]
+    assert ValueError in results
+    assert any(result and result is not ValueError for result in results)
+    assert [] in results
+
+
+def test_mixed_numbers_are_a_float_column(store, fixture_cards):
+    for key in ("cmc", "edhrec_rank"):
+        column = store.column(key)
+        assert column.kind == "number"
+        values = [column.get(row) for row in range(len(store))]
+        assert values == [card[key] for card in fixture_cards]
+        assert {type(value) for value in values} <= {float, type(None)}
+    assert store.column("edhrec_rank").nullable and not store.column("cmc").nullable
+
+
+@pytest.mark.parametrize("query", ["cmc>=3 t:creature", "-edhrec_rank<10000 OR cmc=2.5", "c:g"])
+def test_apply_filters_on_store_matches_list(store, fixture_cards, query):
+    filter = query_to_filter(query)
+    assert apply_filters(store, filter) == apply_filters(fixture_cards, filter)
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+
+def write_cards(cards):
+    with open("cards.json", "w", encoding="utf-8") as f:
+        json.dump(cards, f)
+
+
+@pytest.fixture
+def reloaded(server, cards):
+    """Swaps in cards.json with the cards in reverse order, so every row id means another card."""
+    write_cards(cards[::-1])
+    assert server.reload_card_data()
+    yield
+    write_cards(cards)
+    server.reload_card_data()
+    server.PINNED_CARD_DATA.clear()
+
+
+def start_draft(client):
+    created = client.post("/api/v1/draft/new", json={"set_code": "abc", "player_name": "host", "num_packs": 1}).json()
+    session_id, player_id = created["session_id"], created["player_id"]
+    assert client.post(f"/api/v1/draft/{session_id}/start").status_code == 200
+    return session_id, player_id
+
+
+def pack_names(client, session_id, player_id):
+    status = client.get(f"/api/v1/draft/{session_id}/status", params={"player_id": player_id}).json()
+    return {card_id: status["cards"][str(card_id)]["safe_name"] for card_id in status["pack"]}
+
+
+def test_reload_without_changes(server):
+    assert not server.reload_card_data()
+
+
+def test_draft_keeps_its_card_data_across_reload(client, server, hub, request):
+    session_id, player_id = start_draft(client)
+    version = server.CARD_DATA.version
+    names = pack_names(client, session_id, player_id)
+
+    request.getfixturevalue("reloaded")
+    assert server.CARD_DATA.version != version
+    assert server.PINNED_CARD_DATA[version].version == version
+    assert pack_names(client, session_id, player_id) == names
+
+    card_id, safe_name = next(iter(names.items()))
+    response = client.post(f"/api/v1/draft/{session_id}/pick", json={"player_id": player_id, "card_safe_name": safe_name})
+    assert response.json()["card"] == card_id
+    status = client.get(f"/api/v1/draft/{session_id}/status", params={"player_id": player_id}).json()
+    assert status["cards"][str(card_id)]["safe_name"] == safe_name
+
+    # still in use by the draft
+    server.release_pinned_card_data()
+    assert version in server.PINNED_CARD_DATA
+
+
+def test_draft_without_its_card_data(client, server, hub, request):
+    session_id, player_id = start_draft(client)
+    request.getfixturevalue("reloaded")
+    # e.g. the draft was created by a worker that has since reloaded twice
+    server.PINNED_CARD_DATA.clear()
+
+    response = client.get(f"/api/v1/draft/{session_id}/status", params={"player_id": player_id})
+    assert response.status_code == 410
+    assert response.json()["error"] == "Draft card data is no longer available"
+
+
+def test_unused_card_data_is_released(server, hub, request):
+    version = server.CARD_DATA.version
+    request.getfixturevalue("reloaded")
+    assert version in server.PINNED_CARD_DATA
+    server.release_pinned_card_data()
+    assert version not in server.PINNED_CARD_DATA
@@ -0,0 +1,34 @@
+import logging
+
+import scryfall_syntax_parser
+from scryfall_syntax_parser import query_to_filter
+
+
+CARD = {"name": "Llanowar Elves", "colors": ["G"], "color_identity": ["G"], "cmc": 1.0}
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_debug_print_is_scoped_to_its_filters():
+    logger = scryfall_syntax_parser.logger
+    handler = ListHandler()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        assert query_to_filter("c:g ci:g", debug_print=True).check(CARD)
+        debug_records = len(handler.records)
+        assert query_to_filter("c:g ci:g").check(CARD)
+        assert logger.level == logging.INFO
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    assert debug_records > 0
+    assert len(handler.records) == debug_records
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+
+def test_search(client, cards):
+    response = client.get("/api/v1/search", params={"q": "cmc>=3"})
+    assert response.status_code == 200
+    assert response.json()["total"] == sum(card["cmc"] >= 3 for card in cards)
+
+
+@pytest.mark.parametrize("q", ["pow>abc", "ci="])
+def test_search_invalid_query(client, q):
+    response = client.get("/api/v1/search", params={"q": q})
+    assert response.status_code == 200
+    assert response.json()["error"] == "Failed to process query"
+
+
+def test_export(client, cards):
+    response = client.get("/api/v1/search/export", params={"q": "cmc>=3", "fields": "name"})
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == sum(card["cmc"] >= 3 for card in cards)
+
+
+@pytest.mark.parametrize("q", ["pow>abc", "ci="])
+def test_export_invalid_query(client, q):
+    response = client.get("/api/v1/search/export", params={"q": q})
+    assert response.status_code == 400
+    assert response.json()["error"] == "Failed to process query"
+
+
+def test_image_is_revalidated(client, server):
+    os.makedirs("images", exist_ok=True)
+    with open("images/test-card.webp", "wb") as f:
+        f.write(b"old art")
+    response = client.get("/test-card.webp")
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+    assert client.get("/test-card.webp", headers={"If-None-Match": etag}).status_code == 304
+
+    with open("images/test-card.webp", "wb") as f:
+        f.write(b"new art!")
+    server.STATIC_FILES.clear()
+    response = client.get("/test-card.webp", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.content == b"new art!"
+
+
+def test_search_skips_rows_a_query_never_reaches(client, cards):
+    # usd:1 would fail on a price, but only rows without one get past usd>=0
+    response = client.get("/api/v1/search", params={"q": "usd>=0 OR usd:1", "count_only": True})
+    assert response.json() == {"total": sum(card["price_usd"] is not None for card in cards)}
+
+
+def test_search_pages(client, cards):
+    names, offset = [], 0
+    for expected_size, expected_more in [(25, True), (25, True), (10, False)]:
+        page = client.get("/api/v1/search", params={"q": "cmc>=0", "limit": 25, "offset": offset}).json()
+        assert (page["total"], page["offset"], page["limit"]) == (len(cards), offset, 25)
+        assert (len(page["cards"]), page["has_more"]) == (expected_size, expected_more)
+        names += [card["name"] for card in page["cards"]]
+        offset += 25
+    assert names == [card["name"] for card in cards]
+
+
+@pytest.mark.parametrize("params, size, has_more", [
+    ({"offset": 100}, 0, False),
+    ({"limit": 0}, 0, True),
+    ({"limit": 5000}, 60, False),
+])
+def test_search_page_edges(client, params, size, has_more):
+    page = client.get("/api/v1/search", params={"q": "cmc>=0", **params}).json()
+    assert (len(page["cards"]), page["has_more"]) == (size, has_more)
+    assert page["limit"] == min(params.get("limit", 175), 1000)
+
+
+@pytest.mark.parametrize("params", [{"limit": -1}, {"offset": -1}])
+def test_search_rejects_negative_paging(client, params):
+    assert client.get("/api/v1/search", params={"q": "cmc>=0", **params}).status_code == 422
+
+
+def test_search_fields(client, cards):
+    page = client.get("/api/v1/search", params={"q": "cmc>=3", "fields": " name, cmc ,"}).json()
+    assert page["cards"] == [{"name": card["name"], "cmc": card["cmc"]} for card in cards if card["cmc"] >= 3]
+
+
+@pytest.mark.parametrize("path", ["/api/v1/search", "/api/v1/search/export"])
+def test_unknown_fields_are_rejected(client, path):
+    response = client.get(path, params={"q": "cmc>=3", "fields": "name,nmae,colour"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: nmae, colour"
+
+
+def test_search_count_only(client, cards):
+    response = client.get("/api/v1/search", params={"q": "cmc>=3", "count_only": True, "limit": 1, "fields": "name"})
+    assert response.json() == {"total": sum(card["cmc"] >= 3 for card in cards)}
+
+
+def test_card_by_name(client, cards):
+    safe_name = cards[0]["safe_name"]
+    response = client.get(f"/api/v1/card/{safe_name}")
+    assert response.status_code == 200
+    assert response.json()["card"]["name"] == cards[0]["name"]
+    etag = response.headers["etag"]
+    assert client.get(f"/api/v1/card/{safe_name}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/api/v1/card/{safe_name}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize("if_none_match", [None, "*", "current"])
+def test_missing_card_is_not_found(client, server, if_none_match):
+    headers = {}
+    if if_none_match is not None:
+        headers["If-None-Match"] = server.data_etag(server.CARD_DATA) if if_none_match == "current" else if_none_match
+    response = client.get("/api/v1/card/no-such-card", headers=headers)
+    assert response.status_code == 404
+    assert response.json() == {"error": "Card not found"}
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from card_data import CardData
+from scryfall_bulk_importer import build_store, write_store_snapshot
+from set_pools import SetPools
+
+
+# set code -> (commons, uncommons, rares, mythics, basic lands)
+SETS = {
+    "full": (10, 3, 1, 0, 1),
+    "norare": (11, 3, 0, 0, 1),
+    "noland": (11, 3, 1, 0, 0),
+    "mythic": (11, 3, 0, 1, 1),
+    "fewcommons": (9, 3, 1, 1, 1),
+    "norarenoland": (11, 3, 0, 0, 0),
+    "fewuncommons": (20, 2, 1, 0, 1),
+}
+DRAFTABLE = ["full", "mythic", "noland", "norare"]
+
+
+def set_cards():
+    cards = []
+    for set_code, counts in SETS.items():
+        for rarity, count in zip(("common", "uncommon", "rare", "mythic", "basic"), counts):
+            for i in range(count):
+                name = f"{set_code} {rarity} {i}"
+                cards.append({
+                    "name": name,
+                    "safe_name": name.replace(" ", "-"),
+                    "rarity": "common" if rarity == "basic" else rarity,
+                    "type_line": "Basic Land — Forest" if rarity == "basic" else "Creature — Elf",
+                    "set": [set_code],
+                    "legal_formats": ["modern"],
+                })
+    # neither a common that is not legal anywhere nor a nonbasic land fills a common slot
+    cards.append({"name": "banned", "safe_name": "banned", "rarity": "common", "type_line": "Instant",
+                  "set": ["fewcommons"], "legal_formats": []})
+    cards.append({"name": "dual", "safe_name": "dual", "rarity": "common", "type_line": "Land",
+                  "set": ["fewcommons"], "legal_formats": ["modern"]})
+    return cards
+
+
+@pytest.fixture(scope="module")
+def set_pools():
+    return SetPools.from_store(build_store(set_cards(), "test"))
+
+
+def test_draftable_sets(set_pools):
+    assert set_pools.draftable_sets() == DRAFTABLE
+    assert not set_pools.get("unknown").is_draftable()
+
+
+@pytest.mark.parametrize("set_code", SETS)
+def test_draftable_sets_fill_every_pack(server, set_pools, set_code):
+    sizes = {len(server.generate_pack(set_code, "draft", set_pools)) for _ in range(200)}
+    if set_code in DRAFTABLE:
+        assert sizes == {15}
+    else:
+        assert max(sizes) < 15
+
+
+def test_set_codes_draftable(server, tmp_path):
+    cards = set_cards()
+    assert server.get_set_codes_draftable(CardData(build_store(cards, "test"))) == DRAFTABLE
+
+    # written into the snapshot by prepare_data
+    path = tmp_path / "cards.json"
+    path.write_text(json.dumps(cards), encoding="utf-8")
+    store = write_store_snapshot(str(path))
+    assert store.metadata["draftable_sets"] == DRAFTABLE
+    assert server.get_set_codes_draftable(CardData(store)) == DRAFTABLE
@@ -0,0 +1,72 @@
+import gzip
+
+import pytest
+
+from static_files import StaticFiles
+
+
+BODY = b"console.log('draft');\n" * 20
+
+
+@pytest.fixture
+def static(tmp_path):
+    (tmp_path / "app.js").write_bytes(BODY)
+    (tmp_path / "app.js.br").write_bytes(b"brotli bytes")
+    return StaticFiles({})
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("gzip;q=0", None),
+    ("gzip; q=0.000, deflate", None),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0", None),
+    ("gzip;q=0.5, br;q=0.8", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("br;q=bad, gzip;q=0.1", "gzip"),
+    ("*", "br"),
+    ("*;q=0", None),
+    ("br;q=0, *", "gzip"),
+    ("gzip, *;q=0", "gzip"),
+])
+def test_content_coding_follows_q_values(static, tmp_path, accept_encoding, expected):
+    response = static.response(str(tmp_path / "app.js"), {"accept-encoding": accept_encoding})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == expected
+    assert response.headers["vary"] == "Accept-Encoding"
+    if expected is None:
+        assert response.body == BODY
+    elif expected == "gzip":
+        assert gzip.decompress(response.body) == BODY
+
+
+def test_missing_files_are_not_cached(static, tmp_path):
+    path = str(tmp_path / "later.webp")
+    assert static.response(path, {}) is None
+    assert path not in static.assets
+
+    with open(path, "wb") as f:
+        f.write(b"art")
+    assert static.response(path, {}).headers["content-type"] == "image/webp"
+    assert path in static.assets
+
+
+@pytest.mark.parametrize("if_range, status", [
+    (None, 206),
+    ("etag", 206),
+    ('"other"', 200),
+    # only ETags are compared, so a date never matches and the whole file is sent
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 200),
+])
+def test_if_range(static, tmp_path, if_range, status):
+    path = str(tmp_path / "app.js")
+    headers = {"range": "bytes=0-9"}
+    if if_range is not None:
+        headers["if-range"] = static.lookup(path).etag if if_range == "etag" else if_range
+    response = static.response(path, headers)
+    assert response.status_code == status
+    assert response.body == (BODY[:10] if status == 206 else BODY)
@@ -1,27 +1,82 @@
-
+import argparse
+import os
 import requests
 from tqdm import tqdm
-from prepare_data import prepare_card_data
-from download_images import download_images
-
-# fetch Scryfall data API for the newest bulk data export
-url = "https://api.scryfall.com/bulk-data"
-response = requests.get(url)
-data = response.json()
-download_uri = data["data"][2]["download_uri"]
-print(download_uri)
-
-# download the data file
-file_path = "scryfall-data.json"
-
-# download with progress bar
-with open(file_path, "wb") as file:
-    response = requests.get(download_uri, stream=True)
-    for chunk in tqdm(response.iter_content(chunk_size=8192), desc="Downloading data", unit="KB"):
-        if chunk:
-            file.write(chunk)
-print(f"Data downloaded and saved to {file_path}")
-
-# construct cards.json and images/*.webp files
-prepare_card_data(file_path)
-download_images(file_path)
+from prepare_data import prepare_card_data, read_bulk_updated_at, update_card_data
+from download_images import download_image_jobs
+
+BULK_DATA_URL = "https://api.scryfall.com/bulk-data"
+BULK_FILE_PATH = "scryfall-data.json"
+RELOAD_URL = "http://127.0.0.1:8000/api/v1/admin/reload"
+# sent as X-Admin-Token when set; the server's admin endpoints check it
+ADMIN_TOKEN_ENV = "LOCAL_SCRYFALL_ADMIN_TOKEN"
+
+
+def bulk_data_info(bulk_type):
+    """Scryfall's description of the newest bulk data export of a type: download_uri, updated_at, ..."""
+    response = requests.get(BULK_DATA_URL)
+    response.raise_for_status()
+    return next(item for item in response.json()["data"] if item["type"] == bulk_type)
+
+
+def download_bulk_file(download_uri, file_path):
+    # download with progress bar
+    with open(file_path, "wb") as file:
+        response = requests.get(download_uri, stream=True)
+        response.raise_for_status()
+        for chunk in tqdm(response.iter_content(chunk_size=1 << 16), desc="Downloading data", unit=" chunks"):
+            if chunk:
+                file.write(chunk)
+    print(f"Data downloaded and saved to {file_path}")
+
+
+def notify_server(reload_url):
+    """Asks a running server to switch to the new data; it is fine if none is running."""
+    headers = {}
+    if os.environ.get(ADMIN_TOKEN_ENV):
+        headers["X-Admin-Token"] = os.environ[ADMIN_TOKEN_ENV]
+    try:
+        response = requests.post(reload_url, headers=headers, timeout=30)
+        print(f"Server reload: {response.status_code} {response.text}")
+    except requests.RequestException as e:
+        print(f"Server not notified ({e}); it picks up the new data on its next reload or restart")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Update cards.json, its snapshot and the card images from Scryfall. The bulk file is "
+                    "always downloaded and ingested in full; only an unchanged bulk file (same updated_at) "
+                    "is skipped. Scryfall's daily export changes prices every day, so cards.json and its "
+                    "snapshot are rewritten (and a running server reloads) on almost every run; when no card "
+                    "was added or removed, only the snapshot columns that changed are rebuilt. Either way "
+                    "only new and changed images are downloaded.")
+    parser.add_argument("--full", action="store_true",
+                        help="download and rewrite the card data even if the bulk file is unchanged, in the bulk file's card order")
+    parser.add_argument("--bulk-type", default="default_cards", help="Scryfall bulk data type to build from")
+    parser.add_argument("--reload-url", default=RELOAD_URL, help="server endpoint to notify after an update, empty for none")
+    args = parser.parse_args()
+
+    info = bulk_data_info(args.bulk_type)
+    updated_at = info["updated_at"]
+    if not args.full and read_bulk_updated_at() == updated_at:
+        print(f"Card data is up to date ({updated_at})")
+        return
+    print(info["download_uri"])
+    download_bulk_file(info["download_uri"], BULK_FILE_PATH)
+
+    # construct cards.json and images/*.webp files, reading the bulk file once
+    if args.full:
+        image_jobs = prepare_card_data(BULK_FILE_PATH, updated_at)
+        changes = True
+    else:
+        changes, image_jobs = update_card_data(BULK_FILE_PATH, updated_at)
+        print(f"{changes} cards added, changed or removed")
+    download_image_jobs(image_jobs)
+
+    if changes and args.reload_url:
+        notify_server(args.reload_url)
+
+
+# the guard keeps the ingest worker processes from re-running the update when they import this module
+if __name__ == "__main__":
+    main()